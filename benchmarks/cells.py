@@ -0,0 +1,86 @@
+"""Сравнение ячеек имен NameCell с прежним представлением UserString.
+
+Замеряются память на одну ячейку и время создания, чтения имени,
+переименования и сравнения ячеек путей модулей"""
+import gc
+import timeit
+import argparse
+import tracemalloc
+from collections import UserString
+from typing import Callable
+
+from obfuscator.types import NameCell
+
+
+def memory_per_cell(make: Callable[[str], object], count: int) -> float:
+    """Память в байтах на одну ячейку, без учета самих строк"""
+    names = [f"name_{i}" for i in range(count)]
+    gc.collect()
+    tracemalloc.start()
+    cells = [make(n) for n in names]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del cells
+    # Список ссылок на ячейки
+    return size / count - 8
+
+
+def timings(make: Callable[[str], object], count: int) -> dict[str, float]:
+    """Время операций в наносекундах на одну ячейку"""
+    cells = [make(f"name_{i}") for i in range(count)]
+    # Части пути модуля: общий префикс из одних и тех же ячеек
+    path = cells[:8]
+    other = cells[:8]
+
+    def read():
+        for c in cells:
+            c.data  # type: ignore
+
+    def rename():
+        for c in cells:
+            c.data = "x"  # type: ignore
+
+    def compare():
+        for b, f in zip(path, other):
+            if b != f:
+                break
+
+    result = dict[str, float]()
+    for name, f, n in (
+        ("create", lambda: [make("name") for _ in range(count)], count),
+        ("read", read, count),
+        ("rename", rename, count),
+        ("compare", compare, len(path)),
+    ):
+        best = min(timeit.repeat(f, number=1, repeat=5))
+        result[name] = best / n * 1e9
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.cells")
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+
+    kinds: dict[str, Callable[[str], object]] = {
+        "UserString": UserString,
+        "NameCell": NameCell,
+    }
+
+    print(f"{'':<28}" + "".join(f"{k:>12}" for k in kinds))
+    print(
+        f"{'memory per cell, B':<28}" + "".join(
+            f"{memory_per_cell(make, args.count):>12.1f}"
+            for make in kinds.values()
+        )
+    )
+    results = {k: timings(make, args.count) for k, make in kinds.items()}
+    for op in next(iter(results.values())):
+        print(
+            f"{op + ', ns':<28}"
+            + "".join(f"{results[k][op]:>12.1f}" for k in kinds)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Замеры стадий обфускации на синтетических пакетах.
+
+Каждый размер замеряется в отдельном процессе, чтобы пиковое потребление
+памяти не зависело от предыдущих замеров. По двум крайним размерам
+вычисляется показатель роста времени каждой стадии: 1 - линейный рост,
+2 - квадратичный"""
+import sys
+import json
+import math
+import tempfile
+import argparse
+import subprocess
+from pathlib import Path
+
+from obfuscator.load import load
+from obfuscator.link import link
+from obfuscator.obfuscate import obfuscate
+from obfuscator.emit import emit
+from obfuscator.stats import Stats
+from .synthetic import generate, add_arguments, generator_options
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_memory() -> int | None:
+    """Пиковое потребление памяти процессом в байтах"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS возвращает байты, Linux - килобайты
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(options: dict, jobs: int) -> dict:
+    """Генерация пакета и замер всех стадий в текущем процессе"""
+    with tempfile.TemporaryDirectory() as tmp:
+        src = generate(Path(tmp) / "src", **options)
+        stats = Stats()
+        root_package = load(src, jobs=jobs, stats=stats)
+        link(root_package, stats=stats)
+        obfuscate(root_package, stats=stats)
+        emit(root_package, Path(tmp) / "dst" / "synth", jobs=jobs, stats=stats)
+
+    result = stats.as_dict()
+    result["peak_memory"] = peak_memory()
+    return result
+
+
+def exponent(n1: int, t1: float, n2: int, t2: float) -> float | None:
+    if n1 == n2 or t1 <= 0 or t2 <= 0:
+        return None
+    return math.log(t2 / t1) / math.log(n2 / n1)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    add_arguments(parser)
+    parser.add_argument(
+        "--sizes", type=str, default="50,100,200,400",
+        help="числа модулей через запятую (заменяют --modules)"
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=1)
+    parser.add_argument(
+        "--max-exponent", type=float, default=None,
+        help="завершиться с ошибкой, если показатель роста времени "
+        "связывания превышает данный"
+    )
+    parser.add_argument(
+        "--json", type=Path, default=None,
+        help="записать результаты в файл JSON"
+    )
+    parser.add_argument(
+        "--single", action="store_true", help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    options = generator_options(args)
+
+    if args.single:
+        json.dump(measure(options, args.jobs), sys.stdout)
+        return
+
+    results = dict[int, dict]()
+    for size in (int(s) for s in args.sizes.split(",")):
+        cmd = [
+            sys.executable, "-m", "benchmarks.run", "--single",
+            "--jobs", str(args.jobs),
+        ]
+        for k, v in {**options, "modules": size}.items():
+            cmd += [f"--{k}", str(v)]
+        out = subprocess.run(
+            cmd, check=True, capture_output=True, text=True
+        ).stdout
+        results[size] = json.loads(out)
+
+    # Стадия "связывание" включает разрешение отложенных функций
+    for r in results.values():
+        timings = r["timings"]
+        timings["link (total)"] = (
+            timings["link"] + timings["deferred resolution"]
+        )
+
+    stages = list(next(iter(results.values()))["timings"])
+    sizes = sorted(results)
+
+    print(f"{'modules':<28}" + "".join(f"{s:>12}" for s in sizes))
+    for stage in stages:
+        print(
+            f"{stage + ', s':<28}"
+            + "".join(f"{results[s]['timings'][stage]:>12.3f}" for s in sizes)
+        )
+    if all(results[s]["peak_memory"] is not None for s in sizes):
+        print(
+            f"{'peak memory, MiB':<28}"
+            + "".join(
+                f"{results[s]['peak_memory'] / 2**20:>12.1f}" for s in sizes
+            )
+        )
+
+    print()
+    exponents = dict[str, float | None]()
+    for stage in stages:
+        exponents[stage] = exponent(
+            sizes[0], results[sizes[0]]["timings"][stage],
+            sizes[-1], results[sizes[-1]]["timings"][stage]
+        )
+        if exponents[stage] is not None:
+            print(f"{stage + ' growth':<28}{exponents[stage]:>12.2f}")
+
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "options": options,
+                    "results": results,
+                    "exponents": exponents
+                },
+                f, indent=2
+            )
+
+    link_exponent = exponents["link (total)"]
+    if (
+        args.max_exponent is not None and link_exponent is not None
+        and link_exponent > args.max_exponent
+    ):
+        print(
+            f"link time grows as n^{link_exponent:.2f}, "
+            f"limit is n^{args.max_exponent}",
+            file=sys.stderr
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
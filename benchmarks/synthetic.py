@@ -0,0 +1,171 @@
+"""Генерация синтетических пакетов исходного кода для замеров"""
+import random
+import argparse
+from pathlib import Path
+
+
+def module_source(
+    idx: int,
+    imports: list[str],
+    used: list[str],
+    classes: int,
+    functions: int
+) -> str:
+    """Исходный код модуля с номером idx.
+
+    Args:
+        imports: Строки импорта
+        used: Импортированные имена, используемые в функциях модуля
+        classes: Число классов
+        functions: Число функций и методов класса"""
+    lines = [f'"""Module m{idx}."""']
+    lines += imports
+    lines += ["", "", f"CONST_{idx} = {idx}"]
+
+    for c in range(classes):
+        lines += [
+            "", "",
+            f"class C_{idx}_{c}:",
+            f"    attr = CONST_{idx}",
+            "",
+            "    def __init__(self, v):",
+            "        self.v = v",
+        ]
+        for m in range(functions):
+            lines += [
+                "",
+                f"    def method_{m}(self, x):",
+                "        total = x + self.v",
+                "        for j in range(3):",
+                "            total += j",
+                "        return total",
+            ]
+
+    for f in range(functions):
+        lines += [
+            "", "",
+            f"def f_{idx}_{f}(a, b=1):",
+            f"    local = a + b + CONST_{idx}",
+            "",
+            "    def inner(y):",
+            "        return y * local",
+            "",
+            "    result = [inner(z) for z in range(3)]",
+        ]
+        for name in used:
+            if name.startswith("C_"):
+                lines.append(f"    result.append({name}(a).method_0(b))")
+            else:
+                lines.append(f"    result.append({name}(a))")
+        lines.append("    return sum(result)")
+
+    return "\n".join(lines) + "\n"
+
+
+def generate(
+    path: Path,
+    modules: int = 100,
+    depth: int = 2,
+    branching: int = 2,
+    fanout: int = 3,
+    classes: int = 2,
+    functions: int = 3,
+    relative: float = 0.5,
+    seed: int = 0
+) -> Path:
+    """Создает в директории path синтетический пакет "synth".
+
+    Args:
+        modules: Число модулей
+        depth: Глубина вложенности подпакетов
+        branching: Число подпакетов в каждом пакете
+        fanout: Число импортов в каждом модуле
+            (модули импортируют только из модулей с меньшим номером)
+        classes: Число классов в модуле
+        functions: Число функций в модуле и методов в классе
+        relative: Доля относительных импортов
+        seed: Зерно генератора случайных чисел
+
+    Returns:
+        Путь к корневой директории пакета"""
+    assert classes > 0 or functions > 0
+    rng = random.Random(seed)
+    root = path / "synth"
+
+    # Пакеты в виде списков имен, начиная с корневого
+    packages = [["synth"]]
+    level = [["synth"]]
+    for _ in range(depth):
+        level = [
+            p + [f"p{len(p)}_{b}"]
+            for p in level for b in range(branching)
+        ]
+        packages += level
+
+    for p in packages:
+        d = path.joinpath(*p)
+        d.mkdir(parents=True, exist_ok=True)
+        (d / "__init__.py").write_text("")
+
+    # Пакет каждого модуля
+    owners = [packages[i % len(packages)] for i in range(modules)]
+
+    for idx in range(modules):
+        imports = list[str]()
+        used = list[str]()
+        targets = rng.sample(range(idx), min(fanout, idx))
+        for t in sorted(targets):
+            name = f"f_{t}_0" if functions > 0 else f"C_{t}_0"
+            target_path = owners[t] + [f"m{t}"]
+            if rng.random() < relative:
+                # Относительный импорт
+                own = owners[idx]
+                common = 0
+                while (
+                    common < len(own) and common < len(target_path) - 1
+                    and own[common] == target_path[common]
+                ):
+                    common += 1
+                dots = "." * (len(own) - common + 1)
+                module = dots + ".".join(target_path[common:])
+            else:
+                module = ".".join(target_path)
+            imports.append(f"from {module} import {name}")
+            used.append(name)
+
+        (path.joinpath(*owners[idx]) / f"m{idx}.py").write_text(
+            module_source(idx, imports, used, classes, functions)
+        )
+
+    return root
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--modules", type=int, default=100)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--branching", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--classes", type=int, default=2)
+    parser.add_argument("--functions", type=int, default=3)
+    parser.add_argument(
+        "--relative", type=float, default=0.5,
+        help="доля относительных импортов"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def generator_options(args: argparse.Namespace) -> dict:
+    return {
+        k: getattr(args, k) for k in (
+            "modules", "depth", "branching", "fanout", "classes",
+            "functions", "relative", "seed"
+        )
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.synthetic")
+    parser.add_argument("dst", type=Path, help="директория назначения")
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(generate(args.dst, **generator_options(args)))
@@ -0,0 +1,3 @@
+from .api import obfuscate_sources
+
+__all__ = ["obfuscate_sources"]
@@ -1,82 +1,437 @@
 import sys
+import json
+import logging
 from pathlib import Path
-import ast
-import shutil
-from .types import Package
+import argparse
+from py_compile import PycInvalidationMode
+from .load import load
 from .link import link
+from .shard import link_sharded
 from .obfuscate import obfuscate
+from .emit import emit
+from .archive import (
+    ARCHIVE_SUFFIXES, emit_archive, entry_point_specs, main_source, wheel_name
+)
+from .members import find_entry
+from .artifact import PackageRootError, distribution_metadata, is_artifact
+from .stream import stream
+from .watch import Watcher
+from .cache import BuildCache, IdentifierCache
+from .bytecode import Bytecode
+from .minify import Minifier, minify
+from .shake import shake
+from .profile import Profiler
+from .names import generators, SequentialNameGenerator
+from .stats import Stats
 
-# Первый аргумент программы - файл исходного кода
-if len(sys.argv) <= 1:
-    print("usage: python ast_obfuscate.py `.py file_to_obfuscate`")
-    exit(1)
-
-# Стадия 1
-
-# Исходная директория
-src_dir_path = Path(sys.argv[1])
-assert src_dir_path.is_dir()  # Должна быть директорией
-
-# Директория назначения
-dst_dir_path = Path(sys.argv[2])
-
-# Создание корневого пакета
-root_package = Package(owner=None, name=src_dir_path.name)
-# и его наполнение
-for file_path in src_dir_path.glob("**/*.*"):
-
-    # Получение имен всех подпакетов
-    parts = file_path .relative_to(src_dir_path).with_suffix("").parts
-
-    if "__pycache__" in parts:
-        continue
-
-    # Поиск (или создание) соответствующего подпакета
-    package = root_package
-    while len(parts) > 1:
-        package = package.get_or_add_package(name=parts[0])
-        parts = parts[1:]
-    assert len(parts) > 0
-
-    if file_path.suffix == ".py":
-        # Если файл - модуль, создается его АСД,
-        # и добавляется в соответствующий пакет
-        with open(str(file_path), "rb") as f:
-            package.add_module(
-                name=parts[0],
-                node=ast.parse(source=f.read())
-            )
+
+logger = logging.getLogger("obfuscator")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m obfuscator")
+    parser.add_argument(
+        "src", type=Path,
+        help="исходная директория, либо колесо (.whl), sdist (.tar.gz) "
+        "или zip-архив с исходным кодом"
+    )
+    parser.add_argument(
+        "--package", default=None, metavar="PATH",
+        help="путь корневого пакета внутри исходного архива; по умолчанию "
+        "единственная директория верхнего уровня с __init__.py"
+    )
+    parser.add_argument(
+        "dst", type=Path, nargs="?",
+        help="директория назначения (не нужна при --analyze), либо архив: "
+        "колесо ({имя}-{версия}-{теги}.whl), приложение zipapp (.pyz) "
+        "или zip-архив (.zip)"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="число процессов для разбора, связывания и записи модулей "
+        "(по умолчанию 1, 0 - по числу ядер). Индекс общих сущностей "
+        "доступен только процессам, созданным fork, поэтому без fork "
+        "(Windows) связывание выполняется в одном процессе"
+    )
+    parser.add_argument(
+        "--names", choices=generators.keys(), default="short",
+        help="вид обфусцированных имен: короткие последовательные "
+        "(по умолчанию) или случайные на основе uuid"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=None,
+        help="зерно для перемешивания алфавита коротких имен"
+    )
+    parser.add_argument(
+        "--cache", type=Path, default=None,
+        help="директория кэша сборки; при повторном запуске "
+        "перезаписываются только изменившиеся модули"
+    )
+    parser.add_argument(
+        "--hardlink", action="store_true",
+        help="связывать иные (не .py) файлы жесткими ссылками вместо "
+        "копирования; изменение файла назначения изменит исходный"
+    )
+    parser.add_argument(
+        "--identifier-cache", type=Path, default=None,
+        help="директория кэша имен, встречающихся в исходном коде "
+        "модулей, общего для всех исходных директорий; модули "
+        "разбираются и при попадании в кэш, пропускается только "
+        "сбор имен"
+    )
+    parser.add_argument(
+        "--identifier-cache-size", type=int, default=64,
+        help="наибольший размер кэша имен исходного кода, МиБ "
+        "(по умолчанию 64)"
+    )
+    parser.add_argument(
+        "--bytecode", action="store_true",
+        help="компилировать модули в байткод (__pycache__/*.pyc) "
+        "для интерпретатора, выполняющего обфускацию"
+    )
+    parser.add_argument(
+        "--sourceless", action="store_true",
+        help="записывать только байткод (*.pyc) вместо исходного кода; "
+        "подразумевает --bytecode"
+    )
+    parser.add_argument(
+        "--optimize", type=int, choices=(0, 1, 2), default=0,
+        help="уровень оптимизации байткода, как у python -O "
+        "(по умолчанию 0)"
+    )
+    parser.add_argument(
+        "--invalidation", default="timestamp",
+        choices=("timestamp", "checked-hash", "unchecked-hash"),
+        help="проверка актуальности байткода относительно исходного "
+        "кода (по умолчанию timestamp)"
+    )
+    parser.add_argument(
+        "--main", default=None, metavar="PKG.MOD[:FN]",
+        help="точка входа приложения zipapp (.pyz) по исходным именам: "
+        "функция, либо модуль, выполняемый как __main__"
+    )
+    parser.add_argument(
+        "--entry", action="append", default=[], metavar="PKG.MOD[:ATTR]",
+        help="точка входа для удаления недостижимых модулей, функций "
+        "и классов по исходным именам: модуль (все его определения) "
+        "или его атрибут; может повторяться. Точка входа --main "
+        "учитывается. Недостижимость определяется по ссылкам, "
+        "разрешенным при связывании: getattr, importlib и т. п. не "
+        "учитываются"
+    )
+    parser.add_argument(
+        "--minify", action="store_true",
+        help="удалить строки документации и аннотации локальных "
+        "переменных функций"
+    )
+    parser.add_argument(
+        "--strip-asserts", action="store_true",
+        help="удалить инструкции assert, как python -O"
+    )
+    parser.add_argument(
+        "--minify-report", type=Path, default=None, metavar="PATH",
+        help="записать в файл JSON размер исходного кода модулей и время "
+        "их компиляции и загрузки байткода до и после --minify "
+        "и --strip-asserts"
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="режим ограниченного потребления памяти: тела функций "
+        "разбираются повторно при записи своего модуля"
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="после сборки отслеживать изменения исходной директории "
+        "и перезаписывать измененные модули и использующие их"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=0.5,
+        help="период опроса исходной директории в режиме --watch, с"
+    )
+    parser.add_argument(
+        "--analyze", type=Path, default=None, metavar="PATH",
+        help="не записывать модули, а записать в файл JSON соответствие "
+        "полных исходных имен обфусцированным и неразрешенные ссылки"
+    )
+    parser.add_argument(
+        "--profile", type=Path, default=None, metavar="PATH",
+        help="профилировать связывание: записать в файл стеки вызовов "
+        "в формате collapsed stacks (flamegraph.pl, speedscope) "
+        "и вывести самые долгие модули, методы и места вызова lookup"
+    )
+    parser.add_argument(
+        "--profile-top", type=int, default=10, metavar="N",
+        help="число выводимых модулей при --profile (по умолчанию 10)"
+    )
+    parser.add_argument(
+        "--stats", action="store_true",
+        help="вывести время выполнения стадий и счетчики"
+    )
+    parser.add_argument(
+        "--stats-json", type=Path, default=None,
+        help="записать время выполнения стадий и счетчики в файл JSON"
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="count", default=0,
+        help="журнал стадий (-v) и обрабатываемых сущностей (-vv)"
+    )
+    args = parser.parse_args()
+
+    if args.stream and args.cache is not None:
+        parser.error("--stream несовместим с --cache")
+    if args.watch and (args.stream or args.cache is not None):
+        parser.error("--watch несовместим с --stream и --cache")
+    if args.analyze is not None and (args.stream or args.watch):
+        parser.error("--analyze несовместим с --stream и --watch")
+    if args.profile is not None and (args.stream or args.watch):
+        parser.error("--profile несовместим с --stream и --watch")
+    if args.watch and (args.bytecode or args.sourceless):
+        parser.error("--watch несовместим с --bytecode и --sourceless")
+    if args.watch and (args.minify or args.strip_asserts):
+        parser.error("--watch несовместим с --minify и --strip-asserts")
+    if args.entry and (
+        args.cache is not None or args.stream or args.watch
+    ):
+        # Достижимость определений зависит от всего дерева, а не только
+        # от модулей, которые использует модуль
+        parser.error("--entry несовместим с --cache, --stream и --watch")
+    if args.minify_report is not None and not (
+        args.minify or args.strip_asserts
+    ):
+        parser.error("--minify-report требует --minify или --strip-asserts")
+    if args.minify_report is not None and args.stream:
+        parser.error("--minify-report несовместим с --stream")
+    if args.dst is None and args.analyze is None:
+        parser.error("требуется директория назначения")
+
+    if is_artifact(args.src) and (args.stream or args.watch):
+        parser.error("исходный архив несовместим с --stream и --watch")
+    if args.package is not None and not is_artifact(args.src):
+        parser.error("--package применим только к исходному архиву")
+
+    archive = args.dst is not None and args.dst.suffix in ARCHIVE_SUFFIXES
+    if archive and (
+        args.cache is not None or args.stream or args.watch or args.hardlink
+    ):
+        parser.error(
+            "запись в архив несовместима с --cache, --stream, --watch "
+            "и --hardlink"
+        )
+    if archive and args.dst.suffix == ".whl" and wheel_name(args.dst) is None:
+        parser.error(
+            "имя колеса должно иметь вид {имя}-{версия}-{python}-{abi}-"
+            "{платформа}.whl"
+        )
+    if archive and args.bytecode and not args.sourceless and (
+        args.invalidation == "timestamp"
+    ):
+        parser.error(
+            "байткод с исходным кодом в архиве требует --invalidation "
+            "checked-hash или unchecked-hash"
+        )
+    if (args.main is not None) != (archive and args.dst.suffix == ".pyz"):
+        parser.error("--main требуется для .pyz и только для него")
+
+    logging.basicConfig(
+        format="%(message)s",
+        level=(
+            logging.WARNING, logging.INFO, logging.DEBUG
+        )[min(args.verbose, 2)]
+    )
+    stats = Stats()
+
+    # Стадия 1
+
+    # Исходная директория или архив
+    src_dir_path: Path = args.src
+    assert src_dir_path.is_dir() or is_artifact(src_dir_path)
+
+    # Директория назначения
+    dst_dir_path: Path = args.dst
+
+    bytecode = None
+    if args.bytecode or args.sourceless:
+        bytecode = Bytecode(
+            optimize=args.optimize,
+            invalidation=PycInvalidationMode[
+                args.invalidation.upper().replace("-", "_")
+            ],
+            sourceless=args.sourceless
+        )
+
+    minifier = None
+    if args.minify or args.strip_asserts:
+        minifier = Minifier(
+            docstrings=args.minify,
+            annotations=args.minify,
+            asserts=args.strip_asserts
+        )
+
+    if args.names == "short":
+        generator = SequentialNameGenerator(seed=args.seed)
     else:
-        # Иначе файл добавляется в пакет как сторонний
-        package.other_files.add(file_path)
+        generator = generators[args.names]()
+
+    if args.watch:
+        watcher = Watcher(
+            src_dir_path, dst_dir_path, generator=generator, jobs=args.jobs
+        )
+        try:
+            watcher.run(args.interval)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    # Создание корневого пакета и его наполнение
+    identifier_cache = None
+    if args.identifier_cache is not None:
+        identifier_cache = IdentifierCache(
+            args.identifier_cache,
+            max_size=args.identifier_cache_size * 2**20
+        )
+
+    try:
+        root_package = load(
+            src_dir_path, jobs=args.jobs, stats=stats, strip=args.stream,
+            cache=identifier_cache, package=args.package
+        )
+    except PackageRootError as e:
+        parser.error(str(e))
+    # Имя корневого пакета до обфускации
+    package_name = root_package.name_ptr.data
+
+    if args.stream:
+        # Стадии 2-4 выполняются помодульно
+        stream(
+            root_package, dst_dir_path,
+            generator=generator, stats=stats, bytecode=bytecode,
+            minifier=minifier
+        )
+        report(args, stats)
+        return
+
+    # Стадия 2
+    profiler = None
+    if args.profile is not None:
+        # Замеры дочерних процессов не переносятся, поэтому
+        # при профилировании связывание выполняется в текущем процессе
+        profiler = Profiler()
+        ctx = link(root_package, stats=stats, profiler=profiler)
+        profiler.dump_collapsed(args.profile)
+        print(profiler.summary(args.profile_top), file=sys.stderr)
+    elif args.jobs != 1:
+        ctx = link_sharded(root_package, jobs=args.jobs, stats=stats)
+    else:
+        ctx = link(root_package, stats=stats)
+
+    entry = None
+    if args.main is not None:
+        entry = find_entry(root_package, args.main)
+        if entry is None:
+            parser.error(f"точка входа {args.main} не найдена")
+
+    # Метаданные исходного колеса или sdist для записываемого колеса;
+    # точки входа из entry_points.txt указывают исходные имена
+    dist_info = None
+    entry_points = dict[str, tuple]()
+    if archive and args.dst.suffix == ".whl" and is_artifact(args.src):
+        dist_info = distribution_metadata(src_dir_path)
+        for spec in entry_point_specs(dist_info.get("entry_points.txt", b"")):
+            if spec.partition(":")[0].split(".")[0] != package_name:
+                # Точка входа другого пакета дистрибутива
+                continue
+            e = find_entry(root_package, spec)
+            if e is None:
+                parser.error(
+                    f"точка входа {spec} из entry_points.txt не найдена"
+                )
+            entry_points[spec] = e
+
+    if args.entry:
+        entries = [entry] if entry is not None else []
+        entries.extend(entry_points.values())
+        for spec in args.entry:
+            e = find_entry(root_package, spec)
+            if e is None:
+                parser.error(f"точка входа {spec} не найдена")
+            entries.append(e)
+        shake(root_package, entries, stats=stats)
+
+    cache = None
+    if args.cache is not None:
+        cache = BuildCache(args.cache)
+        cache.update(
+            root_package,
+            options=(
+                f"{bytecode.options() if bytecode else ''}/"
+                f"{minifier.options() if minifier else ''}"
+            )
+        )
+
+    if args.analyze is not None:
+        # Стадия 3 без записи модулей; кэш сборки не изменяется
+        names = dict(cache.names) if cache else dict[str, str]()
+        obfuscate(root_package, names=names, generator=generator, stats=stats)
+        # Корневой пакет не переименовывается: он записывается
+        # в директорию назначения либо в архив под исходным именем
+        names.pop(package_name, None)
+        with open(args.analyze, "w", encoding="utf-8") as f:
+            json.dump(
+                {"names": names, "unresolved": ctx.unresolved},
+                f, indent=2
+            )
+        report(args, stats)
+        return
+
+    if minifier is not None:
+        minify(
+            root_package, minifier,
+            stats=stats, report_path=args.minify_report
+        )
+
+    # Стадия 3
+    obfuscate(
+        root_package,
+        names=cache.names if cache else None,
+        generator=generator,
+        stats=stats
+    )
 
+    # Стадия 4
+    logger.info("writing")
 
-# Стадия 2
-link(root_package)
+    if archive:
+        emit_archive(
+            root_package, dst_dir_path,
+            package_name=package_name,
+            main=(
+                main_source(package_name, entry)
+                if entry is not None else None
+            ),
+            jobs=args.jobs, stats=stats, bytecode=bytecode,
+            dist_info=dist_info, entry_points=entry_points
+        )
+        report(args, stats)
+        return
 
-# Стадия 3
-obfuscate(root_package)
+    emit(
+        root_package, dst_dir_path,
+        jobs=args.jobs, cache=cache, stats=stats, hardlink=args.hardlink,
+        bytecode=bytecode
+    )
 
-# Стадия 4
-print("\nwriting\n")
+    if cache is not None:
+        cache.save()
 
-# Рекурсивное удаление директории назначения, если она существует
-shutil.rmtree(dst_dir_path, ignore_errors=True)
+    report(args, stats)
 
-# Удаление создание директорий и поддиректорий,
-# копирование иных (не .py) файлов
-for p in root_package.walk_packages():
-    dst_path = dst_dir_path / "/".join(s.data for s in p.parts()[1:])
-    dst_path.mkdir(parents=True, exist_ok=True)
 
-    for other_file in p.other_files:
-        assert dst_path.exists()
-        shutil.copyfile(other_file, dst_path/other_file.name)
+def report(args: argparse.Namespace, stats: Stats):
+    if args.stats:
+        print(stats.summary(), file=sys.stderr)
+    if args.stats_json is not None:
+        stats.dump(args.stats_json)
 
-# Обратное преобразование АСД в исходный код, запись в файл
-for node in root_package.walk():
-    parts = node.parts()[1:]
-    parts = "/".join(s.data for s in parts)
 
-    with open(dst_dir_path/f"{parts}.py", "wb") as f:
-        f.write(ast.unparse(node).encode("utf-8"))
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+from typing import Mapping
+from .load import load_sources
+from .link import link
+from .obfuscate import obfuscate
+from .minify import Minifier, minify
+from .emit import emit_sources
+from .names import NameGenerator
+from .stats import Stats
+
+
+def obfuscate_sources(
+    sources: Mapping[str, bytes],
+    name: str = "package",
+    names: dict[str, str] | None = None,
+    generator: NameGenerator | None = None,
+    stats: Stats | None = None,
+    minifier: Minifier | None = None
+) -> dict[str, bytes]:
+    """Обфускация пакета, заданного исходным кодом в памяти,
+    без обращения к файловой системе.
+
+    Все состояние обфускации создается заново при каждом вызове,
+    поэтому функцию можно вызывать многократно и из разных потоков.
+
+    Args:
+        sources: Содержимое файлов по путям относительно корневого пакета,
+            с разделителем "/", например {"sub/mod.py": b"..."}
+        name: Имя корневого пакета, используемое в абсолютных импортах
+        names: См. obfuscate
+        generator: См. obfuscate. Не должен использоваться
+            одновременно в нескольких вызовах
+        stats: Время выполнения стадий и счетчики
+        minifier: Если задан, из модулей удаляется лишнее (см. Minifier)
+
+    Returns:
+        Содержимое обфусцированных файлов по путям
+        относительно корневого пакета"""
+    root_package = load_sources(name, sources, stats=stats)
+    link(root_package, stats=stats)
+    if minifier is not None:
+        minify(root_package, minifier, stats=stats)
+    obfuscate(root_package, names=names, generator=generator, stats=stats)
+    return emit_sources(root_package, stats=stats)
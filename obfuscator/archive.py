@@ -0,0 +1,382 @@
+import os
+import io
+import re
+import csv
+import time
+import base64
+import hashlib
+import zipfile
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from .types import (
+    Package, Module, ClassDef, FunctionDef, AsyncFunctionDef, Name, alias
+)
+from .artifact import ArchiveMember
+from .bytecode import Bytecode
+from .emit import init_worker, render_target, render_module, module_files
+from .stats import Stats
+
+
+ARCHIVE_SUFFIXES = (".whl", ".pyz", ".zip")
+"""Расширения файлов назначения, записываемых как архив"""
+
+
+def archive_date_time() -> tuple[int, int, int, int, int, int]:
+    """Время изменения записей архива: SOURCE_DATE_EPOCH, если задано,
+    иначе 1980-01-01 - наименьшее, представимое в zip"""
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if epoch is None:
+        return (1980, 1, 1, 0, 0, 0)
+    return time.gmtime(max(int(epoch), 315532800))[:6]
+
+
+def wheel_name(path: Path) -> tuple[str, str, str] | None:
+    """Имя дистрибутива, версия и теги из имени файла колеса
+    {name}-{version}(-{build})?-{python}-{abi}-{platform}.whl,
+    либо None"""
+    parts = path.stem.split("-")
+    if len(parts) not in (5, 6):
+        return None
+    return parts[0], parts[1], "-".join(parts[-3:])
+
+
+def expand_tags(tags: str) -> list[str]:
+    """Теги колеса из сжатого набора, например py2.py3-none-any"""
+    python, abi, platform = tags.split("-")
+    return [
+        f"{x}-{y}-{z}"
+        for x in python.split(".")
+        for y in abi.split(".")
+        for z in platform.split(".")
+    ]
+
+
+def normalize_name(name: str) -> str:
+    """Нормализованное имя дистрибутива (PEP 503) для сравнения"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def wheel_metadata(metadata: bytes, name: str, version: str) -> bytes:
+    """METADATA исходного дистрибутива с именем и версией из имени файла
+    колеса, если они отличаются; прочие поля (Requires-Dist,
+    Requires-Python и т. д.) и описание сохраняются"""
+    lines = metadata.decode("utf-8").splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        if line.strip() == "":
+            # Конец заголовков, далее описание
+            break
+        key, _, value = line.partition(":")
+        value = value.strip()
+        if key == "Name" and normalize_name(value) != normalize_name(name):
+            lines[i] = f"Name: {name}\n"
+        elif key == "Version" and value != version:
+            lines[i] = f"Version: {version}\n"
+    return "".join(lines).encode("utf-8")
+
+
+def record_hash(digest: bytes) -> str:
+    """Хеш файла в формате RECORD"""
+    return "sha256=" + base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def entry_spec(
+    package_name: str,
+    entry: tuple[
+        list[Package | Module],
+        list[
+            Package | Module | ClassDef | FunctionDef | AsyncFunctionDef
+            | Name | alias
+        ]
+    ]
+) -> str:
+    """Точка входа вида "pkg.mod:attr.attr" по именам после обфускации
+    для точки входа, найденной members.find_entry"""
+    path, attrs = entry
+    module = ".".join(
+        [package_name, *(e.name_ptr.data for e in path[1:])]
+    )
+    if len(attrs) == 0:
+        return module
+    return module + ":" + ".".join(e.name_ptr.data for e in attrs)
+
+
+def main_source(
+    package_name: str,
+    entry: tuple[
+        list[Package | Module],
+        list[
+            Package | Module | ClassDef | FunctionDef | AsyncFunctionDef
+            | Name | alias
+        ]
+    ]
+) -> bytes:
+    """Исходный код __main__.py приложения zipapp для точки входа,
+    найденной members.find_entry; вызывается после обфускации"""
+    module, _, attrs = entry_spec(package_name, entry).partition(":")
+    if not attrs:
+        return (
+            "import runpy\n"
+            f"runpy.run_module({module!r}, run_name='__main__', "
+            "alter_sys=True)\n"
+        ).encode("utf-8")
+    return f"import {module}\n{module}.{attrs}()\n".encode("utf-8")
+
+
+def entry_point_specs(text: bytes) -> list[str]:
+    """Точки входа (module:attr) из entry_points.txt, без extras"""
+    result = list[str]()
+    for line in text.decode("utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith(("#", ";", "[")):
+            continue
+        _, sep, value = line.partition("=")
+        if sep:
+            result.append(value.split("[")[0].strip())
+    return result
+
+
+def rename_entry_points(
+    text: bytes,
+    package_name: str,
+    entries: dict[str, tuple[
+        list[Package | Module],
+        list[
+            Package | Module | ClassDef | FunctionDef | AsyncFunctionDef
+            | Name | alias
+        ]
+    ]]
+) -> bytes:
+    """entry_points.txt с точками входа entries (по исходным точкам
+    входа, см. entry_point_specs) по именам после обфускации; прочие
+    строки сохраняются"""
+    lines = text.decode("utf-8").splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        key, sep, value = line.partition("=")
+        if not sep or line.lstrip().startswith(("#", ";", "[")):
+            continue
+        spec, bracket, extras = value.partition("[")
+        entry = entries.get(spec.strip())
+        if entry is None:
+            continue
+        lines[i] = (
+            f"{key.rstrip()} = {entry_spec(package_name, entry)}"
+            + (f" [{extras.strip()}" if bracket else "")
+            + "\n"
+        )
+    return "".join(lines).encode("utf-8")
+
+
+def file_chunks(path: Path, size: int = 2**20):
+    with open(path, "rb") as f:
+        while chunk := f.read(size):
+            yield chunk
+
+
+class ArchiveWriter:
+    """Запись файлов в zip-архив с одинаковыми временем изменения
+    и правами, в порядке вызовов. Хеши и размеры записанных файлов
+    сохраняются для RECORD"""
+
+    def __init__(self, path: Path):
+        self.zip = zipfile.ZipFile(path, "w")
+        self.date_time = archive_date_time()
+
+        self.record = list[tuple[str, str, int]]()
+        """Путь, хеш и размер записанных файлов"""
+
+    def info(self, name: str) -> zipfile.ZipInfo:
+        info = zipfile.ZipInfo(name, self.date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o644 << 16
+        return info
+
+    def write(self, name: str, data: bytes):
+        self.zip.writestr(self.info(name), data)
+        self.record.append(
+            (name, record_hash(hashlib.sha256(data).digest()), len(data))
+        )
+
+    def copy(self, name: str, source: Path | ArchiveMember):
+        """Запись файла или файла исходного архива частями, без чтения
+        целиком в память"""
+        if isinstance(source, ArchiveMember):
+            expected_size = source.size
+            chunks = source.chunks()
+        else:
+            expected_size = source.stat().st_size
+            chunks = file_chunks(source)
+
+        h = hashlib.sha256()
+        size = 0
+        with self.zip.open(
+            self.info(name), "w",
+            force_zip64=expected_size >= zipfile.ZIP64_LIMIT
+        ) as dst:
+            for chunk in chunks:
+                h.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+        self.record.append((name, record_hash(h.digest()), size))
+
+    def write_record(self, name: str):
+        """Запись RECORD: всех записанных файлов и самого RECORD
+        без хеша"""
+        f = io.StringIO()
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerows(self.record)
+        writer.writerow((name, "", ""))
+        self.zip.writestr(self.info(name), f.getvalue().encode("utf-8"))
+
+    def close(self):
+        self.zip.close()
+
+
+def emit_archive(
+    root_package: Package,
+    path: Path,
+    package_name: str,
+    main: bytes | None = None,
+    jobs: int = 1,
+    stats: Stats | None = None,
+    bytecode: Bytecode | None = None,
+    dist_info: dict[str, bytes] | None = None,
+    entry_points: dict[str, tuple[
+        list[Package | Module],
+        list[
+            Package | Module | ClassDef | FunctionDef | AsyncFunctionDef
+            | Name | alias
+        ]
+    ]] | None = None
+):
+    """Запись обфусцированного дерева пакетов в архив без промежуточной
+    директории: колесо (.whl), приложение zipapp (.pyz) или zip-архив.
+
+    Файлы записываются в порядке путей, с фиксированным временем
+    изменения (см. archive_date_time), поэтому одинаковое дерево дает
+    одинаковый архив. Колесо получает METADATA, WHEEL и RECORD в
+    директории .dist-info; имя, версия и теги берутся из имени файла.
+    Байткод вместе с исходным кодом должен проверяться по хешу
+
+    Args:
+        package_name: Имя корневого пакета в архиве
+        main: Исходный код __main__.py приложения zipapp (см. main_source)
+        dist_info: Файлы .dist-info исходного дистрибутива по путям
+            внутри нее (см. artifact.distribution_metadata); METADATA
+            создается, только если его нет среди них
+        entry_points: Точки входа entry_points.txt из dist_info,
+            найденные members.find_entry до обфускации; записываются
+            по именам после обфускации (см. rename_entry_points)
+        jobs: Число процессов преобразования модулей; 1 - в текущем
+            процессе, 0 и меньше - по числу ядер"""
+    if stats is None:
+        stats = Stats()
+
+    with stats.stage("emit"):
+        # Записываемые файлы по путям в архиве; для модуля - первый
+        # из его файлов
+        entries = dict[str, Module | Path | bytes | ArchiveMember]()
+        # Пути файлов модулей в архиве: исходный код и байткод
+        module_paths = dict[Module, list[str]]()
+        for p in root_package.walk_packages():
+            prefix = "/".join(
+                [package_name, *(s.data for s in p.parts()[1:])]
+            )
+            for name, other_file in p.other_files.items():
+                entries[f"{prefix}/{name}"] = other_file
+            for e in p.entries:
+                if isinstance(e, Module):
+                    module_paths[e] = [
+                        f.as_posix() for f in module_files(
+                            Path(f"{prefix}/{e.name_ptr.data}.py"), bytecode
+                        )
+                    ]
+                    entries[module_paths[e][0]] = e
+
+        order = sorted(entries)
+        targets = [
+            (e, Path()) for name in order
+            if isinstance(e := entries[name], Module)
+        ]
+        stats.count("written modules", len(targets))
+
+        max_workers = jobs if jobs > 0 else None
+        executor = None
+        if (
+            jobs != 1 and len(targets) > 1
+            and "fork" in multiprocessing.get_all_start_methods()
+        ):
+            # Дочерние процессы наследуют дерево при fork; содержимое
+            # модулей возвращается в порядке targets
+            executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=init_worker,
+                initargs=(targets, bytecode)
+            )
+            workers = max_workers or os.cpu_count() or 1
+            rendered = executor.map(
+                render_target, range(len(targets)),
+                chunksize=max(1, len(targets) // (workers * 4))
+            )
+        else:
+            rendered = (render_module(e, bytecode) for e, _ in targets)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        writer = ArchiveWriter(path)
+        try:
+            if main is not None:
+                writer.write("__main__.py", main)
+
+            for name in order:
+                e = entries[name]
+                if isinstance(e, Module):
+                    for file_name, data in zip(
+                        module_paths[e], next(rendered)
+                    ):
+                        writer.write(file_name, data)
+                elif isinstance(e, Path | ArchiveMember):
+                    writer.copy(name, e)
+                    stats.count("copied files")
+                else:
+                    writer.write(name, e)
+                    stats.count("copied files")
+
+            if path.suffix == ".whl":
+                wheel = wheel_name(path)
+                assert wheel is not None
+                dist_name, version, tags = wheel
+                dist_info_path = f"{dist_name}-{version}.dist-info"
+                dist_files = dict(dist_info or {})
+                if "METADATA" in dist_files:
+                    dist_files["METADATA"] = wheel_metadata(
+                        dist_files["METADATA"], dist_name, version
+                    )
+                else:
+                    dist_files["METADATA"] = (
+                        "Metadata-Version: 2.1\n"
+                        f"Name: {dist_name}\n"
+                        f"Version: {version}\n"
+                    ).encode("utf-8")
+                if "entry_points.txt" in dist_files and entry_points:
+                    dist_files["entry_points.txt"] = rename_entry_points(
+                        dist_files["entry_points.txt"], package_name,
+                        entry_points
+                    )
+                for name in sorted(dist_files):
+                    writer.write(f"{dist_info_path}/{name}", dist_files[name])
+                writer.write(
+                    f"{dist_info_path}/WHEEL",
+                    (
+                        "Wheel-Version: 1.0\n"
+                        "Generator: obfuscator\n"
+                        "Root-Is-Purelib: true\n"
+                        + "".join(f"Tag: {t}\n" for t in expand_tags(tags))
+                    ).encode("utf-8")
+                )
+                writer.write_record(f"{dist_info_path}/RECORD")
+        finally:
+            writer.close()
+            if executor is not None:
+                executor.shutdown()
+
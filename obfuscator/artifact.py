@@ -0,0 +1,203 @@
+import tarfile
+import zipfile
+import threading
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import IO, Generator
+
+
+ARTIFACT_SUFFIXES = (".whl", ".zip", ".tar.gz", ".tgz")
+"""Расширения архивов, из которых может читаться исходный код"""
+
+
+def is_artifact(path: Path) -> bool:
+    return path.is_file() and path.name.endswith(ARTIFACT_SUFFIXES)
+
+
+class PackageRootError(ValueError):
+    """Корневой пакет архива не определен"""
+
+
+class SourceArchive:
+    """Архив с исходным кодом: колесо, sdist (.tar.gz) или zip-архив.
+
+    Члены архива читаются за один последовательный проход (см. read),
+    иные файлы затем копируются из архива по ссылкам (см. ArchiveMember).
+    Для копирования архив открывается один раз; чтение членов
+    выполняется под блокировкой, так как TarFile не допускает
+    параллельного чтения"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.is_zip = zipfile.is_zipfile(path)
+        self.lock = threading.Lock()
+        self._handle: zipfile.ZipFile | tarfile.TarFile | None = None
+
+    def read(self) -> Generator[
+        tuple[str, int, int, bytes | None], None, None
+    ]:
+        """Файлы архива в порядке хранения: путь, размер, время изменения
+        (нс) и, для модулей (.py), содержимое"""
+        if self.is_zip:
+            with zipfile.ZipFile(self.path) as f:
+                for info in f.infolist():
+                    if info.is_dir():
+                        continue
+                    data = None
+                    if info.filename.endswith(".py"):
+                        data = f.read(info)
+                    yield (
+                        info.filename, info.file_size,
+                        int(datetime(*info.date_time).timestamp()) * 10**9,
+                        data
+                    )
+        else:
+            # Потоковое чтение: распаковка без возврата назад
+            with tarfile.open(self.path, "r|*") as f:
+                for info in f:
+                    if not info.isfile():
+                        continue
+                    data = None
+                    if info.name.endswith(".py"):
+                        member = f.extractfile(info)
+                        assert member is not None
+                        data = member.read()
+                    yield info.name, info.size, int(info.mtime) * 10**9, data
+
+    def open(self, name: str) -> IO[bytes]:
+        """Открытие члена архива; вызывается под блокировкой lock"""
+        if self._handle is None:
+            if self.is_zip:
+                self._handle = zipfile.ZipFile(self.path)
+            else:
+                self._handle = tarfile.open(self.path, "r:*")
+        if isinstance(self._handle, zipfile.ZipFile):
+            return self._handle.open(name)
+        member = self._handle.extractfile(name)
+        assert member is not None
+        return member
+
+
+class ArchiveMember:
+    """Иной файл, остающийся в исходном архиве до записи"""
+
+    __slots__ = ("archive", "name", "size", "mtime_ns")
+
+    def __init__(
+        self,
+        archive: SourceArchive,
+        name: str,
+        size: int,
+        mtime_ns: int
+    ):
+        self.archive = archive
+        self.name = name
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    def chunks(self, size: int = 2**20) -> Generator[bytes, None, None]:
+        """Содержимое файла частями, без чтения целиком в память"""
+        with self.archive.lock, self.archive.open(self.name) as f:
+            while chunk := f.read(size):
+                yield chunk
+
+    def read(self) -> bytes:
+        return b"".join(self.chunks())
+
+
+DIST_INFO_GENERATED = frozenset((
+    "RECORD", "RECORD.jws", "RECORD.p7s", "WHEEL", "INSTALLER", "REQUESTED",
+    "direct_url.json"
+))
+"""Файлы .dist-info, которые описывают конкретное колесо или установку
+и не переносятся в записываемое колесо"""
+
+
+def distribution_metadata(path: Path) -> dict[str, bytes]:
+    """Метаданные дистрибутива из исходного архива по путям внутри
+    .dist-info: METADATA, entry_points.txt и прочие файлы .dist-info
+    колеса, кроме DIST_INFO_GENERATED. Для sdist - PKG-INFO (в формате
+    METADATA) и entry_points.txt из .egg-info. Пустой словарь, если
+    метаданных нет"""
+    archive = SourceArchive(path)
+    dist_info = dict[str, str]()
+    egg_info = dict[str, str]()
+    for name, _, _, _ in archive.read():
+        parts = PurePosixPath(name).parts
+        if len(parts) < 2:
+            continue
+        if parts[0].endswith(".dist-info"):
+            rel_path = "/".join(parts[1:])
+            if rel_path not in DIST_INFO_GENERATED:
+                dist_info[rel_path] = name
+        elif len(parts) == 2 and parts[1] == "PKG-INFO":
+            egg_info["METADATA"] = name
+        elif parts[-2].endswith(".egg-info") and (
+            parts[-1] == "entry_points.txt"
+        ):
+            egg_info["entry_points.txt"] = name
+
+    result = dict[str, bytes]()
+    with archive.lock:
+        for rel_path, name in sorted((dist_info or egg_info).items()):
+            with archive.open(name) as f:
+                result[rel_path] = f.read()
+    return result
+
+
+def package_root(names: list[str], package: str | None) -> PurePosixPath:
+    """Путь корневого пакета внутри архива: заданный package либо
+    единственная директория с __init__.py, родитель которой не является
+    пакетом"""
+    if package is not None:
+        return PurePosixPath(package.strip("/"))
+
+    packages = {
+        PurePosixPath(name).parent for name in names
+        if PurePosixPath(name).name == "__init__.py"
+    }
+    roots = sorted(p for p in packages if p.parent not in packages)
+    if len(roots) != 1:
+        raise PackageRootError(
+            "корневой пакет архива не определен однозначно ("
+            + ", ".join(str(p) for p in roots)
+            + "), укажите его путь"
+        )
+    return roots[0]
+
+
+def artifact_files(
+    path: Path,
+    package: str | None = None
+) -> tuple[
+    str,
+    list[tuple[bytes | ArchiveMember, PurePosixPath]]
+]:
+    """Имя корневого пакета архива и его файлы по путям относительно
+    него, в порядке путей, как source_files: исходный код модулей
+    и ссылки на иные файлы.
+
+    Args:
+        package: Путь корневого пакета внутри архива; если не задан,
+            определяется по расположению __init__.py (см. package_root)"""
+    archive = SourceArchive(path)
+    entries = list(archive.read())
+    root = package_root([name for name, _, _, _ in entries], package)
+
+    result = list[tuple[bytes | ArchiveMember, PurePosixPath]]()
+    for name, size, mtime_ns, data in entries:
+        member_path = PurePosixPath(name)
+        if root not in member_path.parents:
+            continue
+        rel_path = member_path.relative_to(root)
+        # Как в source_files: только файлы с расширением
+        if "__pycache__" in rel_path.parts or "." not in rel_path.name:
+            continue
+        result.append((
+            data if data is not None
+            else ArchiveMember(archive, name, size, mtime_ns),
+            rel_path
+        ))
+    result.sort(key=lambda e: e[1])
+    # Пакет в корне архива называется по имени архива
+    return root.name or path.name.split(".")[0], result
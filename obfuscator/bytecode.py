@@ -0,0 +1,80 @@
+import os
+import sys
+import marshal
+import importlib.util
+from pathlib import Path
+from py_compile import PycInvalidationMode
+from .types import Module
+
+
+class Bytecode:
+    """Параметры компиляции модулей в байткод (.pyc).
+
+    Модули компилируются непосредственно из обфусцированного АСД, без
+    преобразования в исходный код и повторного разбора. Байткод
+    предназначен для интерпретатора, выполняющего обфускацию: формат
+    .pyc и тег кэша (например, cpython-311) зависят от его версии.
+    Номера строк в байткоде соответствуют исходному (необфусцированному)
+    коду"""
+
+    def __init__(
+        self,
+        optimize: int = 0,
+        invalidation: PycInvalidationMode = PycInvalidationMode.TIMESTAMP,
+        sourceless: bool = False
+    ):
+        """Args:
+            optimize: Уровень оптимизации, как у python -O (0, 1, 2)
+            invalidation: Способ проверки актуальности .pyc
+                относительно исходного кода
+            sourceless: Записывать только .pyc вместо .py, без исходного
+                кода; invalidation не учитывается"""
+        self.optimize = optimize
+        self.invalidation = invalidation
+        self.sourceless = sourceless
+
+    def options(self) -> str:
+        """Параметры, влияющие на содержимое записываемых файлов"""
+        return (
+            f"{sys.implementation.cache_tag}/{self.optimize}/"
+            f"{self.invalidation.name}/{self.sourceless}"
+        )
+
+    def pyc_path(self, path: Path) -> Path:
+        """Путь .pyc модуля, исходный код которого записывается в path.
+        Без исходного кода .pyc записывается вместо .py, иначе
+        в __pycache__ (sys.pycache_prefix не учитывается)"""
+        if self.sourceless:
+            return path.with_suffix(".pyc")
+        tag = sys.implementation.cache_tag
+        if self.optimize > 0:
+            tag += f".opt-{self.optimize}"
+        return path.parent/"__pycache__"/f"{path.stem}.{tag}.pyc"
+
+    def compile(self, node: Module, filename: str) -> bytes:
+        """Компиляция модуля; возвращает сериализованный объект кода"""
+        code = compile(
+            node, filename, "exec", dont_inherit=True, optimize=self.optimize
+        )
+        return marshal.dumps(code)
+
+    def header(self, source: bytes | None, stat: os.stat_result | None):
+        """Заголовок .pyc. Для проверки по времени изменения требуется
+        stat записанного файла исходного кода, по хешу - source"""
+        magic = importlib.util.MAGIC_NUMBER
+        if source is None:
+            return magic + bytes(12)
+        if self.invalidation == PycInvalidationMode.TIMESTAMP:
+            assert stat is not None
+            return (
+                magic + bytes(4)
+                + (int(stat.st_mtime) & 0xFFFFFFFF).to_bytes(4, "little")
+                + (stat.st_size & 0xFFFFFFFF).to_bytes(4, "little")
+            )
+        flags = 0b01
+        if self.invalidation == PycInvalidationMode.CHECKED_HASH:
+            flags |= 0b10
+        return (
+            magic + flags.to_bytes(4, "little")
+            + importlib.util.source_hash(source)
+        )
@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import hashlib
+from pathlib import Path
+from .types import Package, Module
+
+
+VERSION = 2
+"""Версия формата кэша, увеличивается при изменении формата
+или логики обфускации"""
+
+
+def digest(data: bytes) -> str:
+    """Хеш содержимого файла"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def fingerprint() -> str:
+    """Кэш действителен только для той же версии формата и интерпретатора,
+    так как ast.unparse разных версий может давать разный результат"""
+    return f"{VERSION}/{sys.version}"
+
+
+def module_key(node: Module) -> str:
+    """Ключ модуля в кэше - его исходное полное имя"""
+    return ".".join(p.data for p in node.parts())
+
+
+class BuildCache:
+    """Кэш сборки для повторной обфускации.
+
+    Хранит хеши исходного кода модулей, зависимости модулей друг от друга
+    и соответствие полных имен сущностей обфусцированным, что позволяет
+    не перезаписывать файлы модулей, которые не изменились"""
+
+    def __init__(self, path: Path):
+        """Args:
+            path: Директория кэша"""
+        self.path = path
+
+        self.sources = dict[str, str]()
+        """Хеши исходного кода модулей по ключам модулей"""
+
+        self.dependencies = dict[str, list[str]]()
+        """Ключи модулей, от которых зависит модуль"""
+
+        self.outputs = dict[str, list[str]]()
+        """Пути записанных файлов модулей (исходного кода и байткода)
+        относительно директории назначения"""
+
+        self.options = ""
+        """Параметры записи модулей (см. Bytecode.options); при их
+        изменении перезаписываются все модули"""
+
+        self.other_files = dict[str, list[int | str]]()
+        """Признаки исходных иных файлов (размер и время изменения либо
+        хеш содержимого) по путям относительно директории назначения"""
+
+        self.names = dict[str, str]()
+        """Соответствие полных имен сущностей обфусцированным"""
+
+        self.keys = dict[Module, str]()
+        """Ключи модулей текущей сборки"""
+
+        self.dirty = set[Module]()
+        """Модули текущей сборки, файлы которых необходимо перезаписать"""
+
+        file_path = self.path / "cache.json"
+        if not file_path.exists():
+            return
+
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        if data.get("fingerprint") != fingerprint():
+            return
+
+        self.sources = data["sources"]
+        self.dependencies = data["dependencies"]
+        self.outputs = data["outputs"]
+        self.other_files = data["other_files"]
+        self.names = data["names"]
+        self.options = data["options"]
+
+    def update(self, root_package: Package, options: str = ""):
+        """Определение изменившихся модулей.
+        Вызывается после связывания, но до обфускации"""
+        self.keys = {m: module_key(m) for m in root_package.walk()}
+
+        sources = dict[str, str]()
+        dependencies = dict[str, list[str]]()
+        for m, key in self.keys.items():
+            assert m.source_hash is not None
+            sources[key] = m.source_hash
+            dependencies[key] = sorted(self.keys[d] for d in m.dependencies)
+
+        changed = {
+            m for m, key in self.keys.items()
+            if self.sources.get(key) != sources[key]
+        }
+
+        # Имя из исходного кода, совпавшее с выданным обфусцированным,
+        # затенило бы его; такие имена выдаются заново при обфускации,
+        # и все модули перезаписываются
+        identifiers = set[str]()
+        for m in self.keys:
+            identifiers |= m.identifiers
+        clash = not identifiers.isdisjoint(self.names.values())
+
+        # Модуль перезаписывается, если изменился он сам, один из модулей,
+        # от которых он зависит, или набор этих модулей
+        self.dirty = {
+            m for m, key in self.keys.items()
+            if m in changed
+            or clash
+            or options != self.options
+            or not changed.isdisjoint(m.dependencies)
+            or self.dependencies.get(key) != dependencies[key]
+        }
+
+        self.sources = sources
+        self.dependencies = dependencies
+        self.options = options
+
+    def save(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / "cache.json", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "fingerprint": fingerprint(),
+                    "sources": self.sources,
+                    "dependencies": self.dependencies,
+                    "outputs": self.outputs,
+                    "other_files": self.other_files,
+                    "names": self.names,
+                    "options": self.options,
+                },
+                f
+            )
+
+
+class IdentifierCache:
+    """Кэш имен, встречающихся в исходном коде модулей (см.
+    load.identifiers), по хешу исходного кода.
+
+    АСД не кэшируется: модули разбираются и при попадании в кэш, так как
+    десериализация АСД не быстрее ast.parse; пропускается лишь сбор
+    имен обходом АСД. Записи общие для всех исходных директорий;
+    при превышении размера удаляются записи, к которым дольше всего
+    не обращались"""
+
+    def __init__(self, path: Path, max_size: int = 64 * 2**20):
+        """Args:
+            path: Директория кэша
+            max_size: Наибольший размер записей в байтах"""
+        self.path = path
+        self.max_size = max_size
+
+    def entry_path(self, source_hash: str) -> Path:
+        key = digest(f"{fingerprint()}/{source_hash}".encode("utf-8"))
+        return self.path / key[:2] / key
+
+    def get(self, source_hash: str) -> set[str] | None:
+        file_path = self.entry_path(source_hash)
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                names = json.load(f)
+            # Время изменения - время последнего обращения
+            os.utime(file_path)
+        except (OSError, ValueError):
+            return None
+        return set(names)
+
+    def put(self, source_hash: str, names: set[str]):
+        file_path = self.entry_path(source_hash)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        # Запись во временный файл и замена, так как записи могут
+        # одновременно читаться другими процессами
+        tmp_path = file_path.with_name(f"{file_path.name}.{os.getpid()}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(sorted(names), f)
+        os.replace(tmp_path, file_path)
+
+    def prune(self) -> int:
+        """Удаление записей сверх max_size. Возвращает число удаленных"""
+        entries = list[tuple[int, int, Path]]()
+        for file_path in self.path.glob("*/*"):
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, file_path))
+
+        size = sum(e[1] for e in entries)
+        removed = 0
+        for _, entry_size, file_path in sorted(entries):
+            if size <= self.max_size:
+                break
+            file_path.unlink(missing_ok=True)
+            size -= entry_size
+            removed += 1
+        return removed
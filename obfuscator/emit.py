@@ -0,0 +1,440 @@
+import os
+import sys
+import ast
+import shutil
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from .types import Package, Module
+from .artifact import ArchiveMember
+from .cache import BuildCache, digest
+from .bytecode import Bytecode
+from .stats import Stats
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Запрос ioctl клонирования файла (reflink) в Linux
+FICLONE = 0x40049409 if sys.platform.startswith("linux") else None
+
+
+# Модули, пути их файлов и параметры байткода,
+# доступные процессу-обработчику
+worker_targets = list[tuple[Module, Path]]()
+worker_bytecode: Bytecode | None = None
+
+
+def init_worker(
+    targets: list[tuple[Module, Path]],
+    bytecode: Bytecode | None = None
+):
+    global worker_targets, worker_bytecode
+    worker_targets = targets
+    worker_bytecode = bytecode
+
+
+def write_target(idx: int) -> bool:
+    """Запись модуля worker_targets[idx]"""
+    node, path = worker_targets[idx]
+    return write_module(node, path, worker_bytecode)
+
+
+def write_module(
+    node: Module,
+    path: Path,
+    bytecode: Bytecode | None = None
+) -> bool:
+    """Запись модуля: исходного кода в path и, если задан bytecode,
+    байткода. Возвращает, был ли записан хотя бы один файл"""
+    if bytecode is None:
+        return write_changed(path, ast.unparse(node).encode("utf-8"))
+
+    parts = "/".join(s.data for s in node.parts()[1:])
+    code = bytecode.compile(node, f"{parts}.py")
+    pyc_path = bytecode.pyc_path(path)
+    if bytecode.sourceless:
+        return write_changed(pyc_path, bytecode.header(None, None) + code)
+
+    source = ast.unparse(node).encode("utf-8")
+    written = write_changed(path, source)
+    header = bytecode.header(source, path.stat())
+    return write_changed(pyc_path, header + code) or written
+
+
+def render_target(idx: int) -> list[bytes]:
+    """Содержимое файлов модуля worker_targets[idx]"""
+    node, _ = worker_targets[idx]
+    return render_module(node, worker_bytecode)
+
+
+def render_module(
+    node: Module,
+    bytecode: Bytecode | None = None
+) -> list[bytes]:
+    """Содержимое файлов модуля, в порядке module_files, без записи.
+    Байткод вместе с исходным кодом должен проверяться по хешу:
+    времени изменения файла исходного кода еще нет"""
+    if bytecode is None:
+        return [ast.unparse(node).encode("utf-8")]
+
+    parts = "/".join(s.data for s in node.parts()[1:])
+    code = bytecode.compile(node, f"{parts}.py")
+    if bytecode.sourceless:
+        return [bytecode.header(None, None) + code]
+
+    source = ast.unparse(node).encode("utf-8")
+    return [source, bytecode.header(source, None) + code]
+
+
+def module_files(path: Path, bytecode: Bytecode | None) -> list[Path]:
+    """Файлы, записываемые для модуля с исходным кодом в path"""
+    if bytecode is None:
+        return [path]
+    if bytecode.sourceless:
+        return [bytecode.pyc_path(path)]
+    return [path, bytecode.pyc_path(path)]
+
+
+def write(path: Path, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def write_changed(path: Path, data: bytes) -> bool:
+    """Запись, только если содержимое файла отличается.
+    Возвращает, был ли файл записан"""
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    write(path, data)
+    return True
+
+
+def copy(
+    source: Path | bytes | ArchiveMember,
+    path: Path,
+    hardlink: bool = False
+) -> bool:
+    """Запись иного файла, заданного путем, содержимым или ссылкой
+    на файл архива, если файл назначения отличается. Возвращает, был ли
+    файл записан.
+
+    Файл считается неизменным, если совпадают размер и время изменения
+    (копия получает время изменения исходного файла). Если hardlink,
+    создается жесткая ссылка на исходный файл"""
+    if isinstance(source, ArchiveMember):
+        return copy_member(source, path)
+    if not isinstance(source, Path):
+        return write_changed(path, source)
+
+    src_stat = source.stat()
+    try:
+        dst_stat = path.stat()
+    except FileNotFoundError:
+        dst_stat = None
+
+    if dst_stat is not None:
+        if os.path.samestat(src_stat, dst_stat):
+            if hardlink:
+                return False
+        elif not hardlink and (
+            dst_stat.st_size == src_stat.st_size
+            and dst_stat.st_mtime_ns == src_stat.st_mtime_ns
+        ):
+            return False
+
+    if hardlink:
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}")
+        try:
+            os.link(source, tmp_path)
+            os.replace(tmp_path, path)
+            return True
+        except OSError:
+            # Другая файловая система, либо ссылки не поддерживаются
+            tmp_path.unlink(missing_ok=True)
+
+    # Файл назначения может быть жесткой ссылкой, его содержимое
+    # не перезаписывается
+    path.unlink(missing_ok=True)
+    clone_file(source, path)
+    os.utime(path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    return True
+
+
+def clone_file(source: Path, path: Path):
+    """Копирование файла без переноса содержимого через процесс:
+    клонированием (reflink), если файловая система его поддерживает,
+    иначе copy_file_range или средствами shutil"""
+    with open(source, "rb") as src, open(path, "wb") as dst:
+        if fcntl is not None and FICLONE is not None:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except OSError:
+                pass
+
+        if hasattr(os, "copy_file_range"):
+            size = os.fstat(src.fileno()).st_size
+            copied = 0
+            try:
+                while copied < size:
+                    n = os.copy_file_range(
+                        src.fileno(), dst.fileno(), size - copied
+                    )
+                    if n == 0:
+                        break
+                    copied += n
+            except OSError:
+                pass
+            if copied == size:
+                return
+
+    shutil.copyfile(source, path)
+
+
+def copy_member(source: ArchiveMember, path: Path) -> bool:
+    """Распаковка файла архива, если размер или время изменения файла
+    назначения отличаются"""
+    try:
+        dst_stat = path.stat()
+        if (
+            dst_stat.st_size == source.size
+            and dst_stat.st_mtime_ns == source.mtime_ns
+        ):
+            return False
+    except FileNotFoundError:
+        pass
+
+    path.unlink(missing_ok=True)
+    with open(path, "wb") as f:
+        for chunk in source.chunks():
+            f.write(chunk)
+    os.utime(path, ns=(source.mtime_ns, source.mtime_ns))
+    return True
+
+
+def file_signature(
+    source: Path | bytes | ArchiveMember
+) -> list[int | str]:
+    """Признаки, по которым определяется изменение иного файла"""
+    if isinstance(source, Path):
+        stat = source.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+    if isinstance(source, ArchiveMember):
+        return [source.size, source.mtime_ns]
+    return [len(source), digest(source)]
+
+
+def emit_sources(
+    root_package: Package,
+    stats: Stats | None = None
+) -> dict[str, bytes]:
+    """Обратное преобразование обфусцированного дерева пакетов в исходный
+    код в памяти. Возвращает содержимое файлов по путям относительно
+    корневого пакета"""
+    if stats is None:
+        stats = Stats()
+
+    result = dict[str, bytes]()
+    with stats.stage("emit"):
+        for p in root_package.walk_packages():
+            prefix = "".join(f"{s.data}/" for s in p.parts()[1:])
+            for name, other_file in p.other_files.items():
+                if isinstance(other_file, Path):
+                    other_file = other_file.read_bytes()
+                elif isinstance(other_file, ArchiveMember):
+                    other_file = other_file.read()
+                result[prefix + name] = other_file
+
+        for node in root_package.walk():
+            parts = "/".join(s.data for s in node.parts()[1:])
+            result[f"{parts}.py"] = ast.unparse(node).encode("utf-8")
+
+    stats.count("written modules", sum(1 for _ in root_package.walk()))
+    return result
+
+
+def emit(
+    root_package: Package,
+    dst_dir_path: Path,
+    jobs: int = 1,
+    cache: BuildCache | None = None,
+    stats: Stats | None = None,
+    hardlink: bool = False,
+    bytecode: Bytecode | None = None
+):
+    """Запись обфусцированного дерева пакетов в директорию назначения.
+
+    Файлы, содержимое которых не изменилось, не перезаписываются.
+    Прочие файлы директории назначения удаляются.
+
+    Args:
+        jobs: Число процессов (и потоков ввода-вывода); 1 - запись
+            в текущем потоке, 0 и меньше - по числу ядер
+        cache: Кэш сборки. Если задан, модули, которые не изменились,
+            не преобразуются в исходный код, а удаляются только файлы,
+            записанные прошлой сборкой
+        hardlink: Иные файлы, заданные путем, связываются жесткими
+            ссылками вместо копирования
+        bytecode: Параметры компиляции модулей в байткод. Если заданы,
+            модули компилируются в .pyc (вместе с исходным кодом либо
+            вместо него)"""
+
+    if stats is None:
+        stats = Stats()
+
+    with stats.stage("emit"):
+        # Записываемые пути относительно директории назначения
+        outputs = dict[str, list[str]]()
+        other_files = dict[str, list[int | str]]()
+
+        # Все пути директории назначения, принадлежащие сборке
+        kept = set[Path]()
+
+        max_workers = jobs if jobs > 0 else None
+        written = 0
+
+        # Копирование иных файлов и запись модулей в потоках ввода-вывода.
+        # Потоки запускаются после завершения дочерних процессов: fork
+        # при работающих потоках может унаследовать захваченные ими
+        # блокировки (импорта, журнала, распределителя памяти)
+        io_tasks = list[tuple]()
+
+        # Создание директорий и поддиректорий,
+        # копирование иных (не .py) файлов
+        for p in root_package.walk_packages():
+            dst_path = dst_dir_path / "/".join(s.data for s in p.parts()[1:])
+            dst_path.mkdir(parents=True, exist_ok=True)
+            kept.add(dst_path)
+
+            for name, other_file in p.other_files.items():
+                kept.add(dst_path/name)
+                if cache is not None:
+                    rel_path = (dst_path/name).relative_to(
+                        dst_dir_path
+                    ).as_posix()
+                    other_files[rel_path] = file_signature(other_file)
+                stats.count("copied files")
+                io_tasks.append((copy, other_file, dst_path/name, hardlink))
+
+        # Обратное преобразование АСД в исходный код либо компиляция
+        # в байткод, запись в файл
+        targets = list[tuple[Module, Path]]()
+        for node in root_package.walk():
+            parts = node.parts()[1:]
+            parts = "/".join(s.data for s in parts)
+            path = dst_dir_path/f"{parts}.py"
+            files = module_files(path, bytecode)
+            kept.update(files)
+            for file_path in files:
+                if file_path.parent not in kept:
+                    # __pycache__
+                    file_path.parent.mkdir(exist_ok=True)
+                    kept.add(file_path.parent)
+            if cache is not None:
+                key = cache.keys[node]
+                outputs[key] = [
+                    f.relative_to(dst_dir_path).as_posix() for f in files
+                ]
+                if (
+                    node not in cache.dirty
+                    and cache.outputs.get(key) == outputs[key]
+                    and all(f.exists() for f in files)
+                ):
+                    continue
+            targets.append((node, path))
+
+        stats.count("written modules", len(targets))
+
+        if (
+            jobs != 1 and len(targets) > 1
+            and "fork" in multiprocessing.get_all_start_methods()
+        ):
+            # Дочерние процессы наследуют связанное дерево при fork,
+            # поэтому им передаются только индексы модулей
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=init_worker,
+                initargs=(targets, bytecode)
+            ) as executor:
+                workers = max_workers or os.cpu_count() or 1
+                chunksize = max(1, len(targets) // (workers * 4))
+                written += sum(executor.map(
+                    write_target, range(len(targets)), chunksize=chunksize
+                ))
+        else:
+            # Без fork дерево недоступно другим процессам,
+            # преобразование выполняется в текущем процессе
+            io_tasks.extend(
+                (write_module, node, path, bytecode)
+                for node, path in targets
+            )
+
+        if jobs == 1:
+            written += sum(fn(*args) for fn, *args in io_tasks)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as io_executor:
+                pending = [
+                    io_executor.submit(fn, *args) for fn, *args in io_tasks
+                ]
+                written += sum(f.result() for f in pending)
+
+        stats.count(
+            "unchanged files",
+            stats.counters.get("copied files", 0) + len(targets) - written
+        )
+
+        if cache is not None:
+            # Удаление файлов, записанных прошлой сборкой, но не текущей
+            stale = (
+                {f for files in cache.outputs.values() for f in files}
+                | set(cache.other_files)
+            ) - (
+                {f for files in outputs.values() for f in files}
+                | set(other_files)
+            )
+            for rel_path in stale:
+                remove_file(dst_dir_path, dst_dir_path/rel_path)
+
+            cache.outputs = outputs
+            cache.other_files = other_files
+        else:
+            stats.count(
+                "removed files", remove_stale(dst_dir_path, kept)
+            )
+
+
+def remove_stale(dst_dir_path: Path, kept: set[Path]) -> int:
+    """Удаление файлов и директорий директории назначения, не входящих
+    в kept. Возвращает число удаленных файлов"""
+    removed = 0
+    for dir_path, dir_names, file_names in os.walk(
+        dst_dir_path, topdown=False
+    ):
+        for name in file_names:
+            path = Path(dir_path, name)
+            if path not in kept:
+                path.unlink()
+                removed += 1
+        for name in dir_names:
+            path = Path(dir_path, name)
+            if path not in kept:
+                if path.is_symlink():
+                    path.unlink()
+                else:
+                    path.rmdir()
+    return removed
+
+
+def remove_file(dst_dir_path: Path, path: Path):
+    """Удаление файла и опустевших родительских директорий"""
+    path.unlink(missing_ok=True)
+    path = path.parent
+    while path != dst_dir_path and path.is_dir() and not any(path.iterdir()):
+        path.rmdir()
+        path = path.parent
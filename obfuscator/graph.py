@@ -0,0 +1,140 @@
+import ast
+from .types import Package, Module
+
+
+def scan_imports(node: Module) -> list[tuple[int, str | None, list[str]]]:
+    """Предварительный просмотр инструкций "from ... import ..." модуля,
+    еще не прошедшего связывание. Просматриваются только инструкции,
+    без выражений.
+
+    Returns:
+        Уровень, имя модуля и импортируемые имена каждой инструкции"""
+    result = list[tuple[int, str | None, list[str]]]()
+    stack = list[ast.AST](node.body)
+    while len(stack) > 0:
+        n = stack.pop()
+        if isinstance(n, ast.ImportFrom):
+            result.append((n.level, n.module, [a.name for a in n.names]))
+            continue
+        for field in ("body", "orelse", "finalbody", "handlers", "cases"):
+            stack.extend(getattr(n, field, ()))
+    return result
+
+
+def resolve_imports(root_package: Package, node: Module) -> set[Module]:
+    """Модули пакета, из которых импортирует модуль node.
+    Разрешение повторяет Linker.visit_ImportFrom; импорты, не разрешаемые
+    внутри корневого пакета, пропускаются"""
+    result = set[Module]()
+
+    for level, module, names in scan_imports(node):
+        from_where: Package | Module | None = None
+        if level > 0:
+            from_where = node
+            for _ in range(level):
+                from_where = from_where.owner if from_where else None
+
+        if module is not None:
+            path = module.split(".")
+            if (
+                from_where is None and
+                path[0] == root_package.name_ptr.data
+            ):
+                from_where = root_package
+                path = path[1:]
+
+            for name in path:
+                if not isinstance(from_where, Package):
+                    from_where = None
+                    break
+                from_where = from_where.try_get(name)
+
+        if from_where is None:
+            continue
+
+        if isinstance(from_where, Module):
+            result.add(from_where)
+            continue
+
+        for name in names:
+            e = from_where.try_get(name)
+            if isinstance(e, Module):
+                result.add(e)
+            elif isinstance(e, Package):
+                result.update(m for m in e.entries if isinstance(m, Module))
+            else:
+                init = from_where.try_get_module("__init__")
+                if init is not None:
+                    result.add(init)
+
+    result.discard(node)
+    return result
+
+
+def import_graph(root_package: Package) -> dict[Module, list[Module]]:
+    """Граф импортов: для каждого модуля - модули, из которых он
+    импортирует, в порядке обхода пакета"""
+    order = {m: i for i, m in enumerate(root_package.walk())}
+    return {
+        m: sorted(resolve_imports(root_package, m), key=order.__getitem__)
+        for m in order
+    }
+
+
+def strongly_connected_components(
+    graph: dict[Module, list[Module]]
+) -> list[list[Module]]:
+    """Компоненты сильной связности графа (алгоритм Тарьяна, без рекурсии).
+
+    Компоненты возвращаются в топологическом порядке: каждая компонента
+    следует после компонент, от которых она зависит. Модули внутри
+    компоненты - в порядке ключей graph"""
+    order = {m: i for i, m in enumerate(graph)}
+    index = dict[Module, int]()
+    low = dict[Module, int]()
+    stack = list[Module]()
+    on_stack = set[Module]()
+    result = list[list[Module]]()
+
+    for start in graph:
+        if start in index:
+            continue
+
+        # Стек обхода: вершина и индекс следующего соседа
+        work = [(start, 0)]
+        index[start] = low[start] = len(index)
+        stack.append(start)
+        on_stack.add(start)
+
+        while len(work) > 0:
+            v, i = work[-1]
+            neighbours = graph[v]
+            if i < len(neighbours):
+                work[-1] = (v, i + 1)
+                w = neighbours[i]
+                if w not in index:
+                    index[w] = low[w] = len(index)
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, 0))
+                elif w in on_stack:
+                    low[v] = min(low[v], index[w])
+                continue
+
+            work.pop()
+            if len(work) > 0:
+                u = work[-1][0]
+                low[u] = min(low[u], low[v])
+
+            if low[v] == index[v]:
+                component = list[Module]()
+                while True:
+                    w = stack.pop()
+                    on_stack.remove(w)
+                    component.append(w)
+                    if w is v:
+                        break
+                component.sort(key=order.__getitem__)
+                result.append(component)
+
+    return result
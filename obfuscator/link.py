@@ -1,36 +1,110 @@
 import ast
-from collections import UserString
+import sys
+import time
+import logging
+import builtins
+from contextlib import nullcontext
+from typing import Iterable
 from .types import (
     Module, Name, ClassDef, FunctionDef, AsyncFunctionDef,
-    ImportFrom, Package, Attribute, arg, alias
+    ImportFrom, Package, Attribute, ExceptHandler, NameCell, arg, alias
 )
-from .members import members
+from .members import lookup
+from .stats import Stats
+from .graph import import_graph, strongly_connected_components
+from .profile import Profiler
 
 
-level = 0
+logger = logging.getLogger(__name__)
+
+# Имена, доступные в модуле без определения
+GLOBAL_NAMES = frozenset(dir(builtins)) | {"__file__", "__path__"}
 
 
 class Ctx:
 
-    def __init__(self, root_package: Package):
+    def __init__(
+        self,
+        root_package: Package,
+        stats: Stats,
+        profiler: Profiler | None = None
+    ):
         self.root_package = root_package
-        self.transformed_modules = set[Linker]()
-        self.transforming_modules = set[Linker]()
+        self.root_name = root_package.name_ptr.data
+        """Исходное имя корневого пакета, для абсолютных импортов"""
+        self.stats = stats
+        self.profiler = profiler
 
+        self.linked = set[Module]()
+        """Модули, связывание которых завершено"""
 
-def link(root_package):
-    ctx = Ctx(root_package=root_package)
+        self.linking = set[Module]()
+        """Модули, связывание которых начато"""
 
-    for node in root_package.walk():
-        Linker(
-            node=node,
-            ctx=ctx
-        ).visit(node)
+        self.linkers = list[Linker]()
+        """Связыватели модулей в порядке завершения связывания"""
+
+        self.level = 0
+        """Уровень вложенности, для отступов в журнале"""
+
+        self.unresolved = list[dict[str, str | int | None]]()
+        """Ссылки, которые не удалось разрешить: модуль, строка,
+        вид и имя (см. Linker.report)"""
+
+        self.external = dict[Module, set[str]]()
+        """Имена, связанные в модуле импортами не из корневого пакета;
+        ссылки на них не считаются неразрешенными"""
+
+    def require(self, node: Module):
+        """Связывает модуль, если его связывание еще не начато"""
+        if node not in self.linked and node not in self.linking:
+            Linker(node=node, ctx=self).visit(node)
+
+
+def link(
+    root_package: Package,
+    stats: Stats | None = None,
+    profiler: Profiler | None = None
+) -> Ctx:
+    if stats is None:
+        stats = Stats()
+
+    ctx = link_modules(root_package, stats, profiler)
+
+    logger.info("resolving deferred")
 
-    print("\nresolving deferred\n")
+    with stats.stage("deferred resolution"):
+        for t in ctx.linkers:
+            t.resolve_deferred()
 
-    for t in ctx.transformed_modules:
-        t.resolve_deferred()
+    return ctx
+
+
+def link_modules(
+    root_package: Package,
+    stats: Stats,
+    profiler: Profiler | None = None
+) -> Ctx:
+    """Связывание модулей без тел функций, которые откладываются
+    до resolve_deferred"""
+    ctx = Ctx(root_package=root_package, stats=stats, profiler=profiler)
+
+    with stats.stage("import graph"):
+        components = strongly_connected_components(
+            import_graph(root_package)
+        )
+    stats.count("import cycles", sum(1 for c in components if len(c) > 1))
+
+    # Модули связываются после модулей, из которых они импортируют.
+    # Модули одного цикла импортов связываются вместе: импорт из модуля
+    # цикла, связывание которого еще не начато, связывает его сразу,
+    # как и интерпретатор при циклическом импорте
+    with stats.stage("link"):
+        for component in components:
+            for node in component:
+                ctx.require(node)
+
+    return ctx
 
 
 class Linker(ast.NodeTransformer):
@@ -47,48 +121,108 @@ class Linker(ast.NodeTransformer):
             deferred = list[FunctionDef | AsyncFunctionDef]()
         self.deferred = deferred
 
-    def visit_Module(self, node: Module):
-        global level
+    def visit(self, node: ast.AST):
+        profiler = self.ctx.profiler
+        if profiler is None:
+            return super().visit(node)
+
+        method = "visit_" + node.__class__.__name__
+        if not hasattr(self, method):
+            method = "generic_visit"
+        module = None
+        if isinstance(node, Module):
+            module = '.'.join(p.data for p in node.parts())
+        with profiler.frame(method, module):
+            return super().visit(node)
+
+    def log(self, what: str, name: str):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s%s \"%s\"", "  " * self.ctx.level, what, name)
+
+    def report(self, kind: str, node: ast.AST, name: str):
+        """Запоминает ссылку, которую не удалось разрешить.
+
+        Виды: "external import" - импорт не из корневого пакета,
+        "module import" - инструкция import, такие импорты не связываются,
+        "unresolved name" - имя не определено (кроме встроенных),
+        "arg attribute" - атрибут аргумента функции,
+        "unresolved attribute" - атрибут модуля или класса не найден"""
+        self.ctx.unresolved.append({
+            "module": ".".join(
+                p.data for p in self.node.owning_module().parts()
+            ),
+            "line": getattr(node, "lineno", None),
+            "kind": kind,
+            "name": name,
+        })
+        self.ctx.stats.count("unresolved references")
+
+    def lookup(
+        self,
+        node: Package | Module | ClassDef | FunctionDef | AsyncFunctionDef,
+        name: str
+    ):
+        """lookup с подсчетом обращений"""
+        if self.ctx.profiler is None:
+            e = lookup(node, name)
+        else:
+            start = time.perf_counter_ns()
+            e = lookup(node, name)
+            self.ctx.profiler.lookup(
+                sys._getframe(1).f_code.co_name,
+                time.perf_counter_ns() - start
+            )
+        self.ctx.stats.count("lookups")
+        if e is not None:
+            self.ctx.stats.count("lookup hits")
+        return e
 
+    def visit_Module(self, node: Module):
         full_name = '.'.join(p.data for p in node.parts())
-        if node in (t.node for t in self.ctx.transformed_modules):
-            print(f"{'  '*level}skipping module \"{full_name}\"")
+        if node in self.ctx.linked or node in self.ctx.linking:
+            # Модуль связан, либо связывается (циклический импорт)
+            self.log("skipping module", full_name)
             return node
 
-        assert node not in self.ctx.transforming_modules
-        self.ctx.transforming_modules.add(self)
+        self.ctx.linking.add(node)
 
         assert self.node is node
 
-        print(f"{'  '*level}module \"{full_name}\"")
-        level += 1
+        self.log("module", full_name)
+        self.ctx.stats.count("linked modules")
+        self.ctx.level += 1
 
         self.generic_visit(node)
 
-        self.ctx.transforming_modules.remove(self)
-        self.ctx.transformed_modules.add(self)
+        self.ctx.linking.remove(node)
+        self.ctx.linked.add(node)
+        self.ctx.linkers.append(self)
 
-        level -= 1
+        self.ctx.level -= 1
 
         return node
 
     def resolve_deferred(self):
         assert isinstance(self.node, Module)
 
-        global level
         full_name = '.'.join(p.data for p in self.node.parts())
 
-        print(f"{'  '*level}module (deferred) \"{full_name}\"")
-        level += 1
+        self.log("module (deferred)", full_name)
+        self.ctx.level += 1
 
-        for deferred in self.deferred:
-            Linker(
-                node=deferred,
-                ctx=self.ctx,
-                deferred=self.deferred
-            ).visit(deferred)
+        profiler = self.ctx.profiler
+        with (
+            nullcontext() if profiler is None
+            else profiler.frame("resolve_deferred", f"{full_name} (deferred)")
+        ):
+            for deferred in self.deferred:
+                Linker(
+                    node=deferred,
+                    ctx=self.ctx,
+                    deferred=self.deferred
+                ).visit(deferred)
 
-        level -= 1
+        self.ctx.level -= 1
 
     def visit_ImportFrom(self, node: ast.ImportFrom):
         if node.level == 0:
@@ -106,12 +240,14 @@ class Linker(ast.NodeTransformer):
             path = node.module.split(".")
             if (
                 from_where is None and
-                path[0] == self.ctx.root_package.name_ptr.data
+                path[0] == self.ctx.root_name
             ):
                 from_where = self.ctx.root_package
                 path = path[1:]
 
             if from_where is None:
+                self.report("external import", node, node.module)
+                self.add_external(a.asname or a.name for a in node.names)
                 return node
 
             while len(path) > 0:
@@ -122,6 +258,13 @@ class Linker(ast.NodeTransformer):
         if from_where is None:
             return node
 
+        if isinstance(from_where, Package):
+            init = from_where.try_get_module("__init__")
+            if init is not None:
+                self.add_dependency(init)
+        else:
+            self.add_dependency(from_where)
+
         what = list[
             alias | Package | Module | ClassDef
             | FunctionDef | AsyncFunctionDef | Name
@@ -136,27 +279,25 @@ class Linker(ast.NodeTransformer):
                 e = _from_where.try_get(a.name)
 
                 if isinstance(e, Module):
-                    Linker(node=e, ctx=self.ctx).visit(e)
+                    self.ctx.require(e)
                 elif e is None:
                     init = _from_where.try_get_module("__init__")
                     assert isinstance(init, Module)
-                    Linker(node=init, ctx=self.ctx).visit(init)
+                    self.ctx.require(init)
                     _from_where = init
                 else:
                     assert isinstance(e, Package)
                     for m in e.entries:
                         if isinstance(m, Module):
-                            Linker(node=m, ctx=self.ctx).visit(m)
+                            self.ctx.require(m)
 
             if e is None:
                 assert isinstance(_from_where, Module)
 
-                Linker(node=_from_where, ctx=self.ctx).visit(_from_where)
+                self.ctx.require(_from_where)
 
-                scope = members(_from_where)
-                assert a.name in scope
-
-                e = scope[a.name]
+                e = self.lookup(_from_where, a.name)
+                assert e is not None
 
             assert not isinstance(e, (arg, alias))
 
@@ -168,71 +309,137 @@ class Linker(ast.NodeTransformer):
                 )
 
             what.append(e)
+            self.add_dependency(e)
+            self.node.symbols[a.asname or a.name] = e
 
-        return ImportFrom(
-            owner=self.node,
-            what=what
+        return ast.copy_location(
+            ImportFrom(owner=self.node, what=what), node
         )
 
+    def visit_Import(self, node: ast.Import):
+        # Импорты модулей не связываются
+        for a in node.names:
+            self.report("module import", node, a.name)
+        self.add_external(
+            a.asname or a.name.split(".")[0] for a in node.names
+        )
+        return node
+
+    def add_external(self, names: Iterable[str]):
+        module = self.node.owning_module()
+        self.ctx.external.setdefault(module, set()).update(names)
+
+    def add_dependency(
+        self,
+        e: Package | Module | ClassDef | FunctionDef | AsyncFunctionDef
+        | Name | arg | alias
+    ):
+        """Запоминает модуль(и), к которым относится сущность e,
+        как зависимости текущего модуля"""
+        module = self.node.owning_module()
+
+        if isinstance(e, alias):
+            e = e.entity
+
+        if isinstance(e, arg):
+            # Аргументы не выходят за пределы своей функции
+            return
+        elif isinstance(e, Package):
+            dependencies = set(e.walk())
+        elif isinstance(e, Module):
+            dependencies = {e}
+        elif isinstance(e, Name):
+            dependencies = {e.owner.owning_module()}
+        else:
+            dependencies = {e.owning_module()}
+
+        dependencies.discard(module)
+        module.dependencies.update(dependencies)
+
     def visit_Name(self, node: ast.Name):
         assert type(node) is ast.Name
-        new_node = Name(owner=self.node, id=node.id, ctx=node.ctx)
+        self.ctx.stats.count("names")
 
-        scope = members(self.node)
+        e = self.lookup(self.node, node.id)
 
-        if type(node.ctx) is ast.Store and node.id not in scope:
-            scope[node.id] = new_node
-        elif node.id in scope:
-            e = scope[node.id]
-            new_node.name_ptr = e.name_ptr
+        if e is not None:
+            # Ссылка разделяет ячейку имени с сущностью
+            return ast.copy_location(
+                Name(owner=self.node, id=e.name_ptr, ctx=node.ctx), node
+            )
+
+        new_node = ast.copy_location(
+            Name(owner=self.node, id=node.id, ctx=node.ctx), node
+        )
+        if type(node.ctx) is ast.Store:
+            self.node.assigned[node.id] = new_node
+        elif node.id not in GLOBAL_NAMES and node.id not in (
+            self.ctx.external.get(self.node.owning_module(), ())
+        ):
+            self.report("unresolved name", node, node.id)
 
         return new_node
 
     def visit_Attribute(self, node: ast.Attribute):
         assert type(node) is ast.Attribute
+        # Исходное имя; после visit_Name имя может быть уже обфусцировано
+        left_id = node.value.id if type(node.value) is ast.Name else None
         self.generic_visit(node)
 
-        scope = members(self.node)
         left = node.value
-        right = UserString(node.attr)
+        right = NameCell(node.attr)
 
         if isinstance(left, Name):
-            _left = scope.get(left.id, None)
-            if _left is not None and not isinstance(_left, arg):
+            assert left_id is not None
+            _left = self.lookup(self.node, left_id)
+            if isinstance(_left, arg):
+                self.report("arg attribute", node, f"{left_id}.{node.attr}")
+            elif _left is not None:
                 left = _left
                 if isinstance(left, alias):
                     real_left = left.entity
                 else:
                     real_left = left
                 if not isinstance(real_left, Name | arg):
-                    left_scope = members(real_left)
-                    if right.data in left_scope:
-                        right = left_scope[right.data]
+                    e = self.lookup(real_left, right.data)
+                    if e is not None:
+                        right = e
+                    else:
+                        self.report(
+                            "unresolved attribute", node,
+                            f"{left_id}.{node.attr}"
+                        )
         elif (
             isinstance(left, Attribute)
             and isinstance(left.right, ClassDef | Module)
         ):
-            right_scope = members(left.right)
-            if right.data in right_scope:
-                right = right_scope[right.data]
+            e = self.lookup(left.right, right.data)
+            if e is not None:
+                right = e
+            else:
+                self.report("unresolved attribute", node, node.attr)
+
+        if not isinstance(right, NameCell):
+            self.add_dependency(right)
 
         new_node = Attribute(left=left, right=right, ctx=node.ctx)
-        return new_node
+        return ast.copy_location(new_node, node)
 
     def visit_ClassDef(self, node: ast.ClassDef):
         assert type(node) is ast.ClassDef
 
-        global level
-        print(f"{'  '*level}class \"{node.name}\"")
-        level += 1
+        self.log("class", node.name)
+        self.ctx.stats.count("classes")
+        self.ctx.level += 1
 
         node = ClassDef(owner=self.node, **node.__dict__)
 
         Linker(
             node=node, ctx=self.ctx, deferred=self.deferred
         ).generic_visit(node)
+        self.node.symbols[node.name] = node
 
-        level -= 1
+        self.ctx.level -= 1
 
         return node
 
@@ -240,15 +447,16 @@ class Linker(ast.NodeTransformer):
         if node is self.node:
             assert type(node) is FunctionDef
 
-            global level
-            print(f"{'  '*level}function \"{node.name}\"")
-            level += 1
+            self.log("function", node.name)
+            self.ctx.stats.count("functions")
+            self.ctx.level += 1
 
             self.generic_visit(node)
 
-            level -= 1
+            self.ctx.level -= 1
         elif type(node) is ast.FunctionDef:
             node = FunctionDef(owner=self.node, **node.__dict__)
+            self.node.symbols[node.name] = node
             self.deferred.append(node)
 
         return node
@@ -258,17 +466,38 @@ class Linker(ast.NodeTransformer):
     ):
         if node is self.node:
             assert type(node) is AsyncFunctionDef
+            self.ctx.stats.count("functions")
             self.generic_visit(node)
         elif type(node) is ast.AsyncFunctionDef:
             node = AsyncFunctionDef(owner=self.node, **node.__dict__)
+            self.node.symbols[node.name] = node
             self.deferred.append(node)
 
         return node
 
+    def visit_ExceptHandler(self, node: ast.ExceptHandler):
+        assert type(node) is ast.ExceptHandler
+        if node.name is None:
+            return self.generic_visit(node)
+
+        # Имя "as" связывается, как присваивание
+        target = self.visit_Name(
+            ast.copy_location(ast.Name(id=node.name, ctx=ast.Store()), node)
+        )
+        self.generic_visit(node)
+        return ast.copy_location(
+            ExceptHandler(
+                type=node.type, name=target.name_ptr, body=node.body
+            ),
+            node
+        )
+
     def visit_arg(self, node: ast.arg):
         assert isinstance(node, ast.arg)
         self.generic_visit(node)
-        return arg(**node.__dict__)
+        node = arg(**node.__dict__)
+        self.node.symbols[node.arg] = node
+        return node
 
     def generic_visit(self, node):
         for field, old_value in ast.iter_fields(node):
@@ -0,0 +1,300 @@
+import ast
+from functools import partial
+from pathlib import Path, PurePosixPath
+from typing import Generator, Iterable, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from .types import Package
+from .cache import IdentifierCache, digest
+from .artifact import is_artifact, artifact_files
+from .stats import Stats
+
+
+# Поля определения функции, которые не нужны для связывания модуля
+# и удаляются в режиме ограниченного потребления памяти
+FUNCTION_FIELDS = (
+    "args", "body", "decorator_list", "returns", "type_params"
+)
+
+
+def parse(
+    file_path: Path,
+    strip: bool = False,
+    cache: IdentifierCache | None = None
+) -> tuple[ast.Module, str, set[str]]:
+    """Чтение и разбор файла модуля.
+    Возвращает АСД, хеш содержимого файла и встречающиеся в нем имена.
+    Если strip, из АСД удаляются тела функций (см. strip_functions)"""
+    return parse_file(file_path, strip, cache)[0]
+
+
+def parse_file(
+    file_path: Path,
+    strip: bool,
+    cache: IdentifierCache | None
+) -> tuple[tuple[ast.Module, str, set[str]], bool]:
+    """То же, что parse; также возвращает, найдены ли имена в кэше"""
+    with open(str(file_path), "rb") as f:
+        source = f.read()
+    return parse_bytes(source, str(file_path), strip, cache)
+
+
+def parse_bytes(
+    source: bytes,
+    filename: str,
+    strip: bool,
+    cache: IdentifierCache | None
+) -> tuple[tuple[ast.Module, str, set[str]], bool]:
+    """То же, что parse_file, для исходного кода в памяти"""
+    if cache is None:
+        node, source_hash, names = parse_source(source, filename)
+    else:
+        source_hash = digest(source)
+        names = cache.get(source_hash)
+        node = ast.parse(source=source, filename=filename)
+
+    hit = cache is not None and names is not None
+    if names is None:
+        names = identifiers(node)
+        if cache is not None:
+            cache.put(source_hash, names)
+
+    if strip:
+        strip_functions(function_defs(node))
+    return (node, source_hash, names), hit
+
+
+def parse_source(
+    source: bytes,
+    filename: str = "<unknown>"
+) -> tuple[ast.Module, str, set[str]]:
+    """Разбор исходного кода модуля"""
+    node = ast.parse(source=source, filename=filename)
+    return node, digest(source), identifiers(node)
+
+
+def function_defs(
+    node: ast.AST
+) -> list[ast.FunctionDef | ast.AsyncFunctionDef]:
+    """Определения функций в теле модуля или класса, включая вложенные
+    в составные инструкции и классы, но не в другие функции"""
+    result = list[ast.FunctionDef | ast.AsyncFunctionDef]()
+    stack = list[ast.AST](reversed(getattr(node, "body", [])))
+    while len(stack) > 0:
+        n = stack.pop()
+        if isinstance(n, ast.FunctionDef | ast.AsyncFunctionDef):
+            result.append(n)
+            continue
+        for field in ("finalbody", "orelse", "handlers", "cases", "body"):
+            stack.extend(reversed(getattr(n, field, [])))
+    return result
+
+
+def strip_functions(functions: Iterable[ast.AST]):
+    """Удаление тел, аргументов и декораторов функций. Связывание функций
+    откладывается, поэтому для связывания модуля они не нужны"""
+    for f in functions:
+        for field in FUNCTION_FIELDS:
+            if hasattr(f, field):
+                setattr(f, field, [])
+
+
+def identifiers(node: ast.AST) -> set[str]:
+    """Все имена (идентификаторы), встречающиеся в АСД"""
+    result = set[str]()
+    for n in ast.walk(node):
+        match n:
+            case ast.Name(id=name) | ast.arg(arg=name) \
+                    | ast.Attribute(attr=name) \
+                    | ast.FunctionDef(name=name) \
+                    | ast.AsyncFunctionDef(name=name) \
+                    | ast.ClassDef(name=name):
+                result.add(name)
+            case ast.keyword(arg=str(name)) \
+                    | ast.ExceptHandler(name=str(name)) \
+                    | ast.MatchAs(name=str(name)) \
+                    | ast.MatchStar(name=str(name)) \
+                    | ast.MatchMapping(rest=str(name)):
+                result.add(name)
+            case ast.alias(name=name, asname=asname):
+                result.update(name.split("."))
+                if asname is not None:
+                    result.add(asname)
+            case ast.ImportFrom(module=str(name)):
+                result.update(name.split("."))
+            case ast.Global(names=names) | ast.Nonlocal(names=names) \
+                    | ast.MatchClass(kwd_attrs=names):
+                result.update(names)
+    return result
+
+
+def load(
+    src_dir_path: Path,
+    jobs: int = 1,
+    stats: Stats | None = None,
+    strip: bool = False,
+    cache: IdentifierCache | None = None,
+    package: str | None = None
+) -> Package:
+    """Построение дерева пакетов из исходной директории либо архива
+    (колеса, sdist или zip-архива, см. artifact_files).
+
+    Args:
+        src_dir_path: Исходная директория или архив
+        jobs: Число процессов для разбора модулей; 1 - разбор в текущем
+            процессе, 0 и меньше - по числу ядер
+        strip: Удалять тела функций; они восстанавливаются повторным
+            разбором (см. stream). Только для директории
+        cache: Кэш имен исходного кода модулей; модули разбираются
+            и при попадании в кэш
+        package: Путь корневого пакета внутри архива"""
+    if stats is None:
+        stats = Stats()
+    with stats.stage("parse"):
+        root_package, hits = load_tree(
+            src_dir_path, jobs, strip, cache, package
+        )
+        if cache is not None:
+            stats.count("identifier cache hits", hits)
+            stats.count(
+                "identifier cache misses",
+                sum(1 for _ in root_package.walk()) - hits
+            )
+            stats.count("identifier cache evictions", cache.prune())
+    stats.count("source modules", sum(1 for _ in root_package.walk()))
+    return root_package
+
+
+def load_tree(
+    src_dir_path: Path,
+    jobs: int,
+    strip: bool = False,
+    cache: IdentifierCache | None = None,
+    package_path: str | None = None
+) -> tuple[Package, int]:
+    """Построение дерева пакетов. Возвращает также число модулей,
+    имена которых найдены в кэше"""
+
+    # Файлы исходной директории, либо исходный код модулей и ссылки
+    # на иные файлы архива
+    if is_artifact(src_dir_path):
+        name, files = artifact_files(src_dir_path, package_path)
+    else:
+        name, files = src_dir_path.name, source_files(src_dir_path)
+
+    # Модули, ожидающие разбора, в порядке обхода
+    modules = list[tuple[Package, str, Path | bytes]]()
+    filenames = list[str]()
+
+    # Создание корневого пакета
+    root_package = Package(owner=None, name=name)
+    # и его наполнение
+    for source, rel_path in files:
+        package = file_package(root_package, rel_path.parts)
+
+        if rel_path.suffix == ".py":
+            # Если файл - модуль, он будет разобран позже
+            modules.append((package, rel_path.stem, source))
+            filenames.append(f"{src_dir_path}/{rel_path}")
+        else:
+            # Иначе файл добавляется в пакет как сторонний
+            package.other_files[rel_path.name] = source
+
+    # Создание АСД модулей и добавление их в соответствующие пакеты
+    sources = [source for _, _, source in modules]
+    if len(sources) > 0 and isinstance(sources[0], bytes):
+        # Исходный код модулей архива уже прочитан
+        args = (sources, filenames)
+        parse_one = partial(parse_bytes, strip=strip, cache=cache)
+    else:
+        args = (sources,)
+        parse_one = partial(parse_file, strip=strip, cache=cache)
+    if jobs == 1:
+        results = list(map(parse_one, *args))
+    else:
+        max_workers = jobs if jobs > 0 else None
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(
+                executor.map(parse_one, *args, chunksize=16)
+            )
+    add_modules(modules, (parsed for parsed, _ in results))
+
+    return root_package, sum(1 for _, hit in results if hit)
+
+
+def source_files(
+    src_dir_path: Path
+) -> Generator[tuple[Path, Path], None, None]:
+    """Файлы исходной директории и их пути относительно нее,
+    в порядке обхода"""
+    for file_path in sorted(src_dir_path.glob("**/*.*")):
+        rel_path = file_path.relative_to(src_dir_path)
+
+        if "__pycache__" in rel_path.parts:
+            continue
+
+        yield file_path, rel_path
+
+
+def load_sources(
+    name: str,
+    sources: Mapping[str, bytes],
+    stats: Stats | None = None
+) -> Package:
+    """Построение дерева пакетов из исходного кода в памяти.
+
+    Args:
+        name: Имя корневого пакета
+        sources: Содержимое файлов по путям относительно корневого пакета,
+            с разделителем "/" """
+    if stats is None:
+        stats = Stats()
+
+    with stats.stage("parse"):
+        modules = list[tuple[Package, str, bytes]]()
+        root_package = Package(owner=None, name=name)
+
+        for path in sorted(sources):
+            rel_path = PurePosixPath(path)
+
+            if "__pycache__" in rel_path.parts:
+                continue
+
+            package = file_package(root_package, rel_path.parts)
+
+            if rel_path.suffix == ".py":
+                modules.append((package, rel_path.stem, sources[path]))
+            else:
+                package.other_files[rel_path.name] = sources[path]
+
+        add_modules(
+            modules, (parse_source(source) for _, _, source in modules)
+        )
+
+    stats.count("source modules", len(modules))
+    return root_package
+
+
+def file_package(root_package: Package, parts: tuple[str, ...]) -> Package:
+    """Поиск (или создание) подпакета, содержащего файл,
+    по частям его пути относительно корневого пакета"""
+    package = root_package
+    for name in parts[:-1]:
+        package = package.get_or_add_package(name=name)
+    return package
+
+
+def add_modules(
+    modules: list[tuple[Package, str, Path]] | list[
+        tuple[Package, str, bytes]
+    ],
+    parsed: Iterable[tuple[ast.Module, str, set[str]]]
+):
+    """Добавление разобранных модулей в пакеты в исходном порядке"""
+    for (package, name, source), (node, source_hash, names) in zip(
+        modules, parsed
+    ):
+        m = package.add_module(name=name, node=node)
+        m.source_hash = source_hash
+        m.identifiers = names
+        if isinstance(source, Path):
+            m.source_path = source
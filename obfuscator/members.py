@@ -1,10 +1,93 @@
-import ast
 from .types import (
     Package, Module, ClassDef, FunctionDef, AsyncFunctionDef, Name,
-    ImportFrom, arg, alias
+    arg, alias
 )
 
 
+def lookup(
+    node: Package | Module | ClassDef | FunctionDef | AsyncFunctionDef,
+    name: str
+) -> (
+    Package | Module | ClassDef
+    | FunctionDef | AsyncFunctionDef | Name | arg | alias | None
+):
+    """Поиск сущности с именем name в области видимости node
+    по цепочке родительских областей, без построения словаря"""
+    # Если сущность - пакет, ищем среди сущностей модуля __init__,
+    # затем среди модулей и подпакетов
+    if isinstance(node, Package):
+        init = node.try_get_module("__init__")
+        if init is not None:
+            e = lookup(init, name)
+            if e is not None:
+                return e
+        return node.try_get(name)
+
+    # Определения перекрывают имена родительской сущности
+    e = node.symbols.get(name)
+    if e is not None:
+        return e
+
+    if isinstance(
+        node.owner,
+        Module | ClassDef | FunctionDef | AsyncFunctionDef
+    ):
+        e = lookup(node.owner, name)
+        if e is not None:
+            return e
+
+    # Присваивания видны, только если имя не найдено выше
+    return node.assigned.get(name)
+
+
+def find_entry(
+    root_package: Package,
+    spec: str
+) -> tuple[
+    list[Package | Module],
+    list[
+        Package | Module | ClassDef | FunctionDef | AsyncFunctionDef | Name
+        | alias
+    ]
+] | None:
+    """Поиск сущностей точки входа вида "pkg.mod:attr.attr", как
+    в entry_points; pkg - имя корневого пакета. Возвращает пакеты
+    и модуль пути и сущности атрибутов (импортированные - как alias,
+    имя которого используется в обращении), либо None"""
+    module, _, attrs = spec.partition(":")
+    names = module.split(".")
+    if names[0] != root_package.name_ptr.data:
+        return None
+
+    path = list[Package | Module]([root_package])
+    for name in names[1:]:
+        last = path[-1]
+        e = last.try_get(name) if isinstance(last, Package) else None
+        if e is None:
+            return None
+        path.append(e)
+
+    result = list[
+        Package | Module | ClassDef | FunctionDef | AsyncFunctionDef | Name
+        | alias
+    ]()
+    e = path[-1]
+    for name in attrs.split(".") if attrs else ():
+        if isinstance(e, Package):
+            found = lookup(e, name)
+        elif isinstance(e, Module | ClassDef):
+            # Только собственные сущности, без родительских областей
+            found = e.symbols.get(name) or e.assigned.get(name)
+        else:
+            return None
+        if found is None or isinstance(found, arg):
+            return None
+        result.append(found)
+        e = found.entity if isinstance(found, alias) else found
+
+    return path, result
+
+
 def members(
     node: Package | Module | ClassDef | FunctionDef | AsyncFunctionDef
 ) -> dict[
@@ -12,6 +95,8 @@ def members(
     Package | Module | ClassDef
     | FunctionDef | AsyncFunctionDef | Name | arg | alias
 ]:
+    """Все сущности, видимые в области видимости node.
+    Для поиска одного имени следует использовать lookup"""
     # Если сущность - пакет, возвращаем список его модулей
     if isinstance(node, Package):
         result = {e.name_ptr.data: e for e in node.entries}
@@ -37,44 +122,8 @@ def members(
             | Name | arg | alias
         ]()
 
-    # Визитор, обходящий все дерево и включающий все сущности,
-    # входящие в область видимости данной сущности
-    class Visitor(ast.NodeVisitor):
-
-        def visit_Name(self, node):
-            assert isinstance(node, Name | ast.Name)
-            if (
-                isinstance(node, Name)
-                and type(node.ctx) is ast.Store
-                and node.name_ptr.data not in result
-            ):
-                result[node.name_ptr.data] = node
-
-        def visit_ImportFrom(self, node):
-            assert isinstance(node, ImportFrom | ast.ImportFrom)
-            if isinstance(node, ImportFrom):
-                for what in node.what:
-                    result[what.name_ptr.data] = what
-
-        def visit_ClassDef(self, node):
-            assert isinstance(node, ClassDef | ast.ClassDef)
-            if isinstance(node, ClassDef):
-                result[node.name] = node
-
-        def visit_FunctionDef(self, node):
-            assert isinstance(node, FunctionDef | ast.FunctionDef)
-            if isinstance(node, FunctionDef):
-                result[node.name] = node
-
-        def visit_AsyncFunctionDef(self, node):
-            assert isinstance(node, AsyncFunctionDef | ast.AsyncFunctionDef)
-            if isinstance(node, AsyncFunctionDef):
-                result[node.name] = node
-
-        def visit_arg(self, node: arg):
-            if isinstance(node, arg):
-                result[node.arg] = node
-
-    Visitor().generic_visit(node)
+    for name, e in node.assigned.items():
+        result.setdefault(name, e)
+    result.update(node.symbols)
 
     return result
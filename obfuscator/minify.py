@@ -0,0 +1,170 @@
+import ast
+import json
+import time
+import marshal
+from pathlib import Path
+from .types import Package, Module
+from .stats import Stats
+
+
+# Поля инструкций, содержащие списки вложенных инструкций
+BODY_FIELDS = ("body", "orelse", "finalbody", "handlers", "cases")
+
+
+class Minifier:
+    """Удаление из связанного дерева того, что не требуется при
+    выполнении: строк документации, аннотаций, которые не вычисляются,
+    и, по запросу, инструкций assert.
+
+    Не вычисляются только аннотации локальных переменных функций
+    с присваиванием (x: int = 0 заменяется на x = 0). Аннотации
+    аргументов, классов и модулей сохраняются: они доступны при выполнении
+    (dataclasses, typing.get_type_hints, functools.singledispatch).
+    Аннотации без значения в функциях сохраняются, так как объявляют
+    локальную переменную.
+
+    Обходятся только списки инструкций, выражения не просматриваются"""
+
+    def __init__(
+        self,
+        docstrings: bool = True,
+        annotations: bool = True,
+        asserts: bool = False
+    ):
+        self.docstrings = docstrings
+        self.annotations = annotations
+        self.asserts = asserts
+
+    def options(self) -> str:
+        """Параметры, влияющие на содержимое записываемых файлов"""
+        return f"{self.docstrings}/{self.annotations}/{self.asserts}"
+
+    def __call__(self, node: Module, stats: Stats):
+        self.minify_body(node, False, stats)
+
+    def minify_body(self, node: ast.AST, in_function: bool, stats: Stats):
+        """Обработка списков инструкций node и вложенных инструкций"""
+        if self.docstrings and isinstance(
+            node, ast.Module | ast.ClassDef
+            | ast.FunctionDef | ast.AsyncFunctionDef
+        ):
+            body = node.body
+            if (
+                len(body) > 0
+                and isinstance(body[0], ast.Expr)
+                and isinstance(body[0].value, ast.Constant)
+                and isinstance(body[0].value.value, str)
+            ):
+                del body[0]
+                stats.count("removed docstrings")
+
+        if isinstance(node, ast.FunctionDef | ast.AsyncFunctionDef):
+            in_function = True
+        elif isinstance(node, ast.ClassDef):
+            # Аннотации тела класса вычисляются и в функции
+            in_function = False
+
+        for field in BODY_FIELDS:
+            statements = getattr(node, field, None)
+            if not isinstance(statements, list):
+                continue
+
+            result = list[ast.AST]()
+            for s in statements:
+                s = self.minify_statement(s, in_function, stats)
+                if s is not None:
+                    result.append(s)
+
+            if (
+                len(result) == 0
+                and (field == "body" or len(statements) > 0)
+                and not isinstance(node, ast.Module)
+            ):
+                # Тело составной инструкции не может быть пустым,
+                # в том числе состоявшее из одной строки документации
+                result.append(ast.copy_location(
+                    ast.Pass(), statements[0] if statements else node
+                ))
+            statements[:] = result
+
+    def minify_statement(
+        self,
+        node: ast.AST,
+        in_function: bool,
+        stats: Stats
+    ) -> ast.AST | None:
+        """Инструкция, которой заменяется node, либо None"""
+        if self.asserts and isinstance(node, ast.Assert):
+            stats.count("removed asserts")
+            return None
+
+        if (
+            self.annotations and in_function
+            and isinstance(node, ast.AnnAssign) and node.value is not None
+        ):
+            stats.count("removed annotations")
+            return ast.copy_location(
+                ast.Assign(targets=[node.target], value=node.value), node
+            )
+
+        self.minify_body(node, in_function, stats)
+        return node
+
+
+def measure(node: Module) -> tuple[int, float, float]:
+    """Размер исходного кода модуля в байтах, время компиляции
+    исходного кода и время загрузки байткода (из .pyc), в секундах.
+    Из этих двух частей состоит время импорта без выполнения модуля"""
+    source = ast.unparse(node).encode("utf-8")
+
+    start = time.perf_counter()
+    code = compile(source, "<minify>", "exec", dont_inherit=True)
+    compiled = time.perf_counter()
+
+    data = marshal.dumps(code)
+    start_load = time.perf_counter()
+    marshal.loads(data)
+    loaded = time.perf_counter()
+
+    return len(source), compiled - start, loaded - start_load
+
+
+def minify(
+    root_package: Package,
+    minifier: Minifier,
+    stats: Stats | None = None,
+    report_path: Path | None = None
+):
+    """Удаление лишнего из модулей связанного дерева (см. Minifier).
+    Выполняется после связывания, до или после обфускации.
+
+    Args:
+        report_path: Если задан, в файл JSON записываются по модулям
+            размер исходного кода и время компиляции и загрузки байткода
+            до и после удаления. Замер требует двух преобразований
+            в исходный код и компиляций каждого модуля"""
+    if stats is None:
+        stats = Stats()
+
+    report = list[dict]()
+    with stats.stage("minify"):
+        for node in root_package.walk():
+            if report_path is None:
+                minifier(node, stats)
+                continue
+
+            before = measure(node)
+            minifier(node, stats)
+            after = measure(node)
+
+            report.append({
+                "module": ".".join(p.data for p in node.parts()),
+                "bytes": [before[0], after[0]],
+                "compile": [before[1], after[1]],
+                "load": [before[2], after[2]],
+            })
+            stats.count("minified bytes saved", before[0] - after[0])
+
+    if report_path is not None:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
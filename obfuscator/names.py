@@ -0,0 +1,85 @@
+import random
+import string
+from typing import Iterable
+
+
+class NameGenerator:
+    """Генератор обфусцированных имен.
+    Наследники реализуют generate; повторы и зарезервированные имена
+    (встречающиеся в исходном коде или уже выданные) пропускаются"""
+
+    def __init__(self):
+        self.reserved = set[str]()
+
+    def reserve(self, names: Iterable[str]):
+        """Запрет выдачи имен names"""
+        self.reserved.update(names)
+
+    def generate(self) -> str:
+        raise NotImplementedError
+
+    def __call__(self) -> str:
+        while True:
+            name = self.generate()
+            if name not in self.reserved:
+                self.reserved.add(name)
+                return name
+
+
+class SequentialNameGenerator(NameGenerator):
+    """Короткие имена вида "_a", "_b", ..., "_a0", ... по порядку.
+
+    Используются только строчные буквы, так как имена модулей и пакетов
+    становятся именами файлов, а файловая система может не различать
+    регистр. Имена не начинаются с "__", чтобы избежать искажения имен
+    внутри классов"""
+
+    def __init__(self, seed: int | None = None):
+        """Args:
+            seed: Если задан, алфавит перемешивается, и последовательность
+                имен зависит от seed"""
+        super().__init__()
+        first = list(string.ascii_lowercase + string.digits)
+        rest = first + ["_"]
+        if seed is not None:
+            rng = random.Random(seed)
+            rng.shuffle(first)
+            rng.shuffle(rest)
+        self.first = first
+        self.rest = rest
+        self.counter = 0
+
+    def generate(self) -> str:
+        n = self.counter
+        self.counter += 1
+
+        # Количество символов после первого
+        length = 0
+        count = len(self.first)
+        while n >= count:
+            n -= count
+            length += 1
+            count = len(self.first) * len(self.rest) ** length
+
+        chars = list[str]()
+        for _ in range(length):
+            n, r = divmod(n, len(self.rest))
+            chars.append(self.rest[r])
+        chars.append(self.first[n])
+
+        return "_" + "".join(reversed(chars))
+
+
+class UuidNameGenerator(NameGenerator):
+    """Случайные имена на основе uuid4, различные при каждом запуске"""
+
+    def generate(self) -> str:
+        import uuid
+        return "_" + str(uuid.uuid4()).replace("-", "_")
+
+
+generators = {
+    "short": SequentialNameGenerator,
+    "uuid": UuidNameGenerator,
+}
+"""Доступные генераторы по именам"""
@@ -1,51 +1,163 @@
 from .types import (
     Package, Module, ClassDef, FunctionDef, AsyncFunctionDef, Name, arg, alias
 )
-from .members import members
+from .names import NameGenerator, SequentialNameGenerator
+from .stats import Stats
 
 
-# Получение обфусцированного имени.
-def next_obfuscated_name() -> str:
-    import uuid
-    return "_" + str(uuid.uuid4()).replace("-", "_")
+def qualified_name(
+    node: Package | ClassDef | Module | FunctionDef | AsyncFunctionDef | Name
+) -> str:
+    """Полное имя сущности, начиная с корневого пакета"""
+    if isinstance(node, Package | Module):
+        return ".".join(p.data for p in node.parts())
+    return f"{qualified_name(node.owner)}.{node.name_ptr.data}"
 
 
-handled_nodes = set()
-
-
-def handle_node(
+def is_renamed(
     node: Package | ClassDef | Module | FunctionDef | AsyncFunctionDef
     | Name | arg | alias
-):
-    # Вершина уже обрабатывалась, пропуск
-    if node in handled_nodes:
-        return
-    handled_nodes.add(node)
-
-    # 1. Обфускация имени
-
-    if (  # Если вершина есть пакет или класс
+) -> bool:
+    """Подлежит ли имя сущности обфускации"""
+    return (  # Если вершина есть пакет или класс
         isinstance(node, Package | ClassDef)
     ) or (  # , либо модуль, кроме "__init__",
         isinstance(node, Module) and not node.name_ptr.data == "__init__"
     ) or (  # , либо функция, определенная в модуле или другой функции
         isinstance(node, FunctionDef | AsyncFunctionDef | Name)
         and isinstance(node.owner, Module | FunctionDef | AsyncFunctionDef)
-    ):
-        # , то обфусцировать имя
-        node.name_ptr.data = next_obfuscated_name()
+    )
+
+
+def own_members(
+    node: Package | ClassDef | Module | FunctionDef | AsyncFunctionDef
+) -> list[
+    Package | Module | ClassDef
+    | FunctionDef | AsyncFunctionDef | Name | arg | alias
+]:
+    """Сущности, определенные непосредственно в node,
+    без сущностей родительских областей видимости"""
+    if isinstance(node, Package):
+        return list(node.entries)
+    return [*node.assigned.values(), *node.symbols.values()]
+
+
+def entity_module(
+    node: Package | ClassDef | Module | FunctionDef | AsyncFunctionDef
+    | Name | arg | alias
+) -> Module | None:
+    """Модуль, в котором определена сущность; None для пакетов
+    и аргументов"""
+    if isinstance(node, Package | arg):
+        return None
+    if isinstance(node, Name | alias):
+        return node.owner.owning_module()
+    return node.owning_module()
 
-    #  2. Обфускация дочерних вершин
 
-    if not isinstance(node, Name | arg | alias):
-        for m in members(node).values():
-            handle_node(m)
+def renamed_nodes(
+    root_package: Package,
+    modules: set[Module] | None = None
+) -> list[
+    Package | ClassDef | Module | FunctionDef | AsyncFunctionDef | Name
+]:
+    """Обход связанного графа сущностей в глубину, начиная с модулей
+    и их пакетов. Возвращает сущности, имена которых подлежат обфускации,
+    в порядке обхода.
+
+    Если задано modules, обходятся только сущности этих модулей,
+    без пакетов"""
+    result = list[
+        Package | ClassDef | Module | FunctionDef | AsyncFunctionDef | Name
+    ]()
+
+    # Обработанные за данный вызов вершины
+    visited = set[
+        Package | ClassDef | Module | FunctionDef | AsyncFunctionDef
+        | Name | arg | alias
+    ]()
+
+    # Вершины, ожидающие обработки; обрабатываются с конца
+    stack = list[
+        Package | ClassDef | Module | FunctionDef | AsyncFunctionDef
+        | Name | arg | alias
+    ]()
+    for node in reversed(list(root_package.walk())):
+        if modules is not None and node not in modules:
+            continue
+        # Сначала пакет модуля (тип Package), затем сам модуль (тип Module)
+        stack.append(node)
+        stack.append(node.owner)
+
+    while len(stack) > 0:
+        node = stack.pop()
+
+        # Вершина уже обрабатывалась, пропуск
+        if node in visited:
+            continue
+        # Сущность вне заданных модулей, пропуск
+        if modules is not None and entity_module(node) not in modules:
+            continue
+        visited.add(node)
+
+        if is_renamed(node):
+            result.append(node)
+
+        # Дочерние вершины
+        if not isinstance(node, Name | arg | alias):
+            stack.extend(reversed(own_members(node)))
+
+    return result
+
+
+def obfuscate(
+    root_package: Package,
+    names: dict[str, str] | None = None,
+    generator: NameGenerator | None = None,
+    stats: Stats | None = None
+):
+    """Args:
+        names: Соответствие полных имен сущностей обфусцированным.
+            Если задано, уже известные сущности сохраняют прежние имена,
+            а новые добавляются в него
+        generator: Генератор обфусцированных имен,
+            по умолчанию SequentialNameGenerator"""
+    if generator is None:
+        generator = SequentialNameGenerator()
+    if stats is None:
+        stats = Stats()
+
+    with stats.stage("rename"):
+        # Обфусцированные имена не должны совпадать
+        # с именами из исходного кода
+        identifiers = set[str]()
+        for node in root_package.walk():
+            identifiers |= node.identifiers
+        generator.reserve(identifiers)
+        if names is not None:
+            # Известные имена, совпавшие с новыми именами исходного кода,
+            # выдаются заново (см. BuildCache.update)
+            for qualified in [
+                q for q, name in names.items() if name in identifiers
+            ]:
+                del names[qualified]
+            generator.reserve(names.values())
 
+        renamed = renamed_nodes(root_package)
+        stats.count("renamed", len(renamed))
 
-def obfuscate(root_package: Package):
-    for node in root_package.walk():
-        # Обработка пакета модуля (тип Package)
-        handle_node(node.owner)
+        if names is None:
+            for node in renamed:
+                node.name_ptr.data = generator()
+        else:
+            # Полные имена вычисляются до переименования
+            qualified_names = [qualified_name(node) for node in renamed]
+            for node, qualified in zip(renamed, qualified_names):
+                name = names.get(qualified)
+                if name is None:
+                    name = names[qualified] = generator()
+                node.name_ptr.data = name
 
-        # Обработка самого модуля (тип Module)
-        handle_node(node)
+        # Имена модулей и подпакетов изменились, индексы пакетов устарели
+        for package in root_package.walk_packages():
+            package.reindex()
@@ -0,0 +1,108 @@
+import time
+from pathlib import Path
+from contextlib import contextmanager
+
+
+class Profiler:
+    """Профилирование связывания: время и число вызовов методов visit_*
+    связывателя, время по модулям и по местам вызова lookup.
+
+    Время вершины стека делится на собственное и время вложенных вызовов;
+    собственное время относится к ближайшему модулю в стеке"""
+
+    def __init__(self):
+        self.methods = dict[str, list[int]]()
+        """Число вызовов, общее и собственное время (нс) по методам"""
+
+        self.modules = dict[str, int]()
+        """Собственное время (нс) по модулям, без времени связывания
+        импортируемых ими модулей"""
+
+        self.lookups = dict[str, list[int]]()
+        """Число вызовов и время (нс) lookup по вызывающим методам"""
+
+        self.stacks = dict[tuple[str, ...], int]()
+        """Собственное время (нс) по стекам вызовов"""
+
+        # Открытые вызовы: имя, время начала, время вложенных вызовов
+        self.stack = list[list]()
+        self.names = list[str]()
+        self.module_stack = list[str]()
+
+    @contextmanager
+    def frame(self, name: str, module: str | None = None):
+        """Замер вызова name; если задан module, вызов связывает модуль
+        и в стеке обозначается его именем"""
+        if module is not None:
+            self.module_stack.append(module)
+        self.names.append(module if module is not None else name)
+        entry = [name, time.perf_counter_ns(), 0]
+        self.stack.append(entry)
+        try:
+            yield
+        finally:
+            self.stack.pop()
+            elapsed = time.perf_counter_ns() - entry[1]
+            own = elapsed - entry[2]
+
+            if len(self.stack) > 0:
+                self.stack[-1][2] += elapsed
+
+            m = self.methods.setdefault(name, [0, 0, 0])
+            m[0] += 1
+            m[1] += elapsed
+            m[2] += own
+
+            key = tuple(self.names)
+            self.stacks[key] = self.stacks.get(key, 0) + own
+            self.names.pop()
+
+            if len(self.module_stack) > 0:
+                current = self.module_stack[-1]
+                self.modules[current] = self.modules.get(current, 0) + own
+            if module is not None:
+                self.module_stack.pop()
+
+    def lookup(self, site: str, elapsed: int):
+        entry = self.lookups.setdefault(site, [0, 0])
+        entry[0] += 1
+        entry[1] += elapsed
+
+    def summary(self, top: int = 10) -> str:
+        """Сводка: top самых долгих модулей, методы и места вызова lookup"""
+        lines = list[str]()
+
+        lines.append(f"{'module':<48}{'time, s':>12}")
+        for name, ns in sorted(
+            self.modules.items(), key=lambda i: i[1], reverse=True
+        )[:top]:
+            lines.append(f"{name:<48}{ns / 1e9:>12.3f}")
+
+        lines.append("")
+        lines.append(
+            f"{'method':<32}{'calls':>12}{'total, s':>12}{'self, s':>12}"
+        )
+        for name, (calls, total, own) in sorted(
+            self.methods.items(), key=lambda i: i[1][2], reverse=True
+        ):
+            lines.append(
+                f"{name:<32}{calls:>12}{total / 1e9:>12.3f}{own / 1e9:>12.3f}"
+            )
+
+        lines.append("")
+        lines.append(f"{'lookup site':<32}{'calls':>12}{'time, s':>12}")
+        for site, (calls, ns) in sorted(
+            self.lookups.items(), key=lambda i: i[1][1], reverse=True
+        ):
+            lines.append(f"{site:<32}{calls:>12}{ns / 1e9:>12.3f}")
+
+        return "\n".join(lines)
+
+    def dump_collapsed(self, path: Path):
+        """Запись стеков в формате collapsed stacks (flamegraph.pl,
+        speedscope): стек через ";" и собственное время в микросекундах"""
+        with open(path, "w", encoding="utf-8") as f:
+            for key, ns in self.stacks.items():
+                us = ns // 1000
+                if us > 0:
+                    f.write(f"{';'.join(key)} {us}\n")
@@ -0,0 +1,253 @@
+import ast
+from .types import (
+    Package, Module, ClassDef, FunctionDef, AsyncFunctionDef, Name,
+    Attribute, ImportFrom, arg, alias
+)
+from .obfuscate import own_members
+from .stats import Stats
+
+
+def removable(node: ast.stmt) -> bool:
+    """Может ли определение уровня модуля быть удалено, если на него нет
+    ссылок. Определения с декораторами и классы с базовыми классами или
+    метаклассом сохраняются: при определении они могут регистрировать
+    себя (декоратором, метаклассом, __init_subclass__)"""
+    if isinstance(node, FunctionDef | AsyncFunctionDef):
+        return len(node.decorator_list) == 0 and not (
+            node.name.startswith("__") and node.name.endswith("__")
+        )
+    if isinstance(node, ClassDef):
+        return (
+            len(node.decorator_list) == 0
+            and len(node.bases) == 0 and len(node.keywords) == 0
+        )
+    return False
+
+
+def dunder_all(node: Module) -> set[str]:
+    """Имена, перечисленные в __all__ модуля строками"""
+    result = set[str]()
+    for s in node.body:
+        if isinstance(s, ast.Assign | ast.AugAssign | ast.AnnAssign):
+            targets = s.targets if isinstance(s, ast.Assign) else [s.target]
+            if not any(
+                isinstance(t, Name) and t.id == "__all__" for t in targets
+            ):
+                continue
+            if isinstance(s.value, ast.List | ast.Tuple):
+                result.update(
+                    e.value for e in s.value.elts
+                    if isinstance(e, ast.Constant) and isinstance(e.value, str)
+                )
+    return result
+
+
+class Shaker:
+    """Поиск достижимых модулей и определений уровня модулей по ссылкам
+    связанного дерева, начиная с точек входа.
+
+    Модуль достижим, если достижимо что-либо из него; тогда достижим
+    весь его код уровня модуля, кроме удаляемых определений (см.
+    removable), и модули __init__ его пакетов. Определение достижимо,
+    если на него ссылается достижимый код. Классы сохраняются целиком,
+    так как обращения к методам через экземпляры не разрешаются.
+
+    Ссылки, не разрешаемые связыванием (getattr, строки, импорт через
+    importlib), не учитываются"""
+
+    def __init__(self, root_package: Package):
+        self.root_package = root_package
+
+        self.entities = dict[
+            int,
+            Package | Module | ClassDef | FunctionDef | AsyncFunctionDef
+            | Name | alias
+        ]()
+        """Сущности по id ячеек их имен; ссылки разделяют ячейки
+        с сущностями"""
+
+        self.candidates = set[ClassDef | FunctionDef | AsyncFunctionDef]()
+        """Определения уровня модулей, которые удаляются,
+        если недостижимы"""
+
+        self.reachable = set[
+            Module | ClassDef | FunctionDef | AsyncFunctionDef
+        ]()
+        self.pending = list[
+            Module | ClassDef | FunctionDef | AsyncFunctionDef
+        ]()
+
+        for p in root_package.walk_packages():
+            self.entities[id(p.name_ptr)] = p
+        stack = list[
+            Package | Module | ClassDef | FunctionDef | AsyncFunctionDef
+            | Name | arg | alias
+        ](root_package.walk())
+        while len(stack) > 0:
+            e = stack.pop()
+            if isinstance(e, arg | Package):
+                continue
+            self.entities[id(e.name_ptr)] = e
+            if not isinstance(e, Name | alias):
+                stack.extend(own_members(e))
+
+        for m in root_package.walk():
+            self.candidates.update(s for s in m.body if removable(s))
+
+    def require(
+        self,
+        e: Package | Module | ClassDef | FunctionDef | AsyncFunctionDef
+        | Name | arg | alias
+    ):
+        """Отметка сущности e как достижимой"""
+        if isinstance(e, alias):
+            e = e.entity
+        if isinstance(e, arg):
+            return
+        if isinstance(e, Package):
+            init = e.try_get_module("__init__")
+            if init is not None:
+                self.require(init)
+            return
+        if isinstance(e, Name):
+            e = e.owner
+
+        # Определение уровня модуля, содержащее e
+        while not isinstance(e, Module) and not isinstance(e.owner, Module):
+            e = e.owner
+        if e not in self.candidates:
+            e = e.owning_module()
+
+        if e not in self.reachable:
+            self.reachable.add(e)
+            self.pending.append(e)
+
+    def require_import(self, name: str):
+        """Абсолютный импорт модуля корневого пакета (import pkg.mod)"""
+        parts = name.split(".")
+        if parts[0] != self.root_package.name_ptr.data:
+            return
+        e: Package | Module | None = self.root_package
+        self.require(self.root_package)
+        for part in parts[1:]:
+            if not isinstance(e, Package):
+                break
+            e = e.try_get(part)
+            if e is None:
+                break
+            self.require(e)
+
+    def scan(self, node: ast.AST):
+        """Отметка сущностей, на которые ссылается код node"""
+        for n in ast.walk(node):
+            if isinstance(n, Name):
+                e = self.entities.get(id(n.name_ptr))
+                if e is not None:
+                    self.require(e)
+            elif isinstance(n, Attribute):
+                # Выражение слева просматривается ast.walk
+                for e in (n.left, n.right):
+                    if isinstance(
+                        e, Package | Module | ClassDef | FunctionDef
+                        | AsyncFunctionDef | Name | alias
+                    ):
+                        self.require(e)
+            elif isinstance(n, ImportFrom):
+                for e in n.what:
+                    self.require(e)
+            elif isinstance(n, ast.Import):
+                for a in n.names:
+                    self.require_import(a.name)
+
+    def run(self):
+        while len(self.pending) > 0:
+            e = self.pending.pop()
+            if not isinstance(e, Module):
+                self.require(e.owning_module())
+                self.scan(e)
+                continue
+
+            # Импорт модуля выполняет модули __init__ его пакетов
+            package = e.owner
+            while package is not None:
+                self.require(package)
+                package = package.owner
+
+            exported = dunder_all(e)
+            for s in e.body:
+                if s not in self.candidates:
+                    self.scan(s)
+                elif s.name in exported:
+                    self.require(s)
+
+
+def shake(
+    root_package: Package,
+    entries: list[tuple[
+        list[Package | Module],
+        list[
+            Package | Module | ClassDef | FunctionDef | AsyncFunctionDef
+            | Name | alias
+        ]
+    ]],
+    stats: Stats | None = None
+):
+    """Удаление модулей и определений уровня модулей, недостижимых
+    из точек входа (см. Shaker). Выполняется после связывания,
+    до обфускации.
+
+    Args:
+        entries: Точки входа, найденные members.find_entry. Точка входа
+            без атрибутов (модуль или пакет) делает достижимыми все
+            его определения"""
+    if stats is None:
+        stats = Stats()
+
+    with stats.stage("tree shaking"):
+        shaker = Shaker(root_package)
+        for path, attrs in entries:
+            for e in path:
+                shaker.require(e)
+            for e in attrs:
+                shaker.require(e)
+            if len(attrs) == 0:
+                module = path[-1]
+                if isinstance(module, Package):
+                    module = module.try_get_module("__init__")
+                if module is not None:
+                    for s in module.body:
+                        if s in shaker.candidates:
+                            shaker.require(s)
+        shaker.run()
+
+        removed_modules = set[Module]()
+        for m in list(root_package.walk()):
+            if m not in shaker.reachable:
+                m.owner.remove_entry(m)
+                removed_modules.add(m)
+                continue
+
+            removed = {
+                s for s in m.body
+                if s in shaker.candidates and s not in shaker.reachable
+            }
+            if len(removed) == 0:
+                continue
+            m.body = [s for s in m.body if s not in removed]
+            m.symbols = {
+                k: v for k, v in m.symbols.items() if v not in removed
+            }
+            stats.count("removed definitions", len(removed))
+
+        # Пакеты без модулей и иных файлов
+        for p in reversed(list(root_package.walk_packages())):
+            if (
+                p.owner is not None
+                and len(p.entries_by_name) == 0 and len(p.other_files) == 0
+            ):
+                p.owner.remove_entry(p)
+
+        for m in root_package.walk():
+            m.dependencies -= removed_modules
+
+    stats.count("removed modules", len(removed_modules))
@@ -0,0 +1,230 @@
+import gc
+import ast
+import io
+import os
+import copyreg
+import pickle
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from . import types
+from .types import (
+    Package, Module, ClassDef, FunctionDef, AsyncFunctionDef, NameCell
+)
+from .load import FUNCTION_FIELDS
+from .link import Ctx, Linker, link, link_modules
+from .obfuscate import own_members
+from .stats import Stats
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExportIndex:
+    """Сущности и ячейки имен, существующие после связывания модулей,
+    но до связывания функций: пакеты, модули, и сущности в таблицах
+    символов модулей и классов, включая оболочки отложенных функций.
+
+    Дочерние процессы, созданные fork, содержат те же объекты по тем же
+    адресам, поэтому ссылки на них передаются номерами в индексе"""
+
+    def __init__(self, root_package: Package):
+        self.entries = list[object]()
+        self.numbers = dict[int, int]()
+        """Номер объекта в entries по id объекта"""
+
+        stack = list[object]([root_package])
+        while len(stack) > 0:
+            e = stack.pop()
+            if id(e) in self.numbers:
+                continue
+            self.add(e)
+
+            cell = getattr(e, "name_ptr", None)
+            if isinstance(cell, NameCell):
+                self.add(cell)
+
+            if isinstance(
+                e, Package | Module | ClassDef | FunctionDef | AsyncFunctionDef
+            ):
+                stack.extend(own_members(e))
+
+    def add(self, e: object):
+        if id(e) not in self.numbers:
+            self.numbers[id(e)] = len(self.entries)
+            self.entries.append(e)
+
+
+# Типы вершин АСД, определенные в types: их конструкторы могут
+# требовать аргументов, а ast.AST восстанавливается вызовом
+# конструктора без аргументов
+NODE_TYPES = tuple(
+    t for t in vars(types).values()
+    if isinstance(t, type) and issubclass(t, ast.AST)
+    and t.__module__ == types.__name__
+)
+
+
+class ShardPickler(pickle.Pickler):
+    """Сериализация результатов связывания; объекты из индекса
+    заменяются их номерами"""
+
+    def __init__(self, file, index: ExportIndex):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.index = index
+
+    def persistent_id(self, obj):
+        return self.index.numbers.get(id(obj))
+
+    def reducer_override(self, obj):
+        if isinstance(obj, NODE_TYPES):
+            return copyreg.__newobj__, (type(obj),), obj.__dict__
+        return NotImplemented
+
+
+class ShardUnpickler(pickle.Unpickler):
+    """Десериализация результатов связывания; номера заменяются
+    объектами индекса, так что ссылки дочерних процессов на общие
+    сущности и ячейки имен указывают на объекты текущего процесса"""
+
+    def __init__(self, file, index: ExportIndex):
+        super().__init__(file)
+        self.index = index
+
+    def persistent_load(self, pid):
+        return self.index.entries[pid]
+
+
+# Связыватели модулей и индекс, доступные процессу-обработчику
+worker_linkers = list[Linker]()
+worker_index: ExportIndex | None = None
+
+
+def init_worker(linkers: list[Linker], index: ExportIndex):
+    global worker_linkers, worker_index
+    worker_linkers = linkers
+    worker_index = index
+    # Сборка мусора отключена в родительском процессе на время fork
+    gc.enable()
+
+
+def resolve_shard(idx: int) -> bytes:
+    """Связывание функций модуля worker_linkers[idx].
+    Возвращает сериализованные тела и таблицы символов функций,
+    вложенные функции, зависимости модуля, неразрешенные ссылки
+    и приращения счетчиков"""
+    assert worker_index is not None
+    t = worker_linkers[idx]
+    assert isinstance(t.node, Module)
+
+    stats = t.ctx.stats
+    counters = dict(stats.counters)
+    n = len(t.deferred)
+    reported = len(t.ctx.unresolved)
+
+    t.resolve_deferred()
+
+    functions = [
+        (
+            {
+                field: getattr(f, field)
+                for field in FUNCTION_FIELDS if hasattr(f, field)
+            },
+            f.symbols,
+            f.assigned
+        )
+        for f in t.deferred[:n]
+    ]
+    result = (
+        functions,
+        t.deferred[n:],
+        set(t.node.dependencies),
+        t.ctx.unresolved[reported:],
+        {
+            k: v - counters.get(k, 0) for k, v in stats.counters.items()
+            if v != counters.get(k, 0)
+        }
+    )
+
+    f = io.BytesIO()
+    ShardPickler(f, worker_index).dump(result)
+    return f.getvalue()
+
+
+def merge_shard(t: Linker, data: bytes, index: ExportIndex, stats: Stats):
+    """Перенос результатов связывания функций модуля в дерево
+    текущего процесса"""
+    functions, nested, dependencies, unresolved, counters = ShardUnpickler(
+        io.BytesIO(data), index
+    ).load()
+
+    for f, (fields, symbols, assigned) in zip(t.deferred, functions):
+        for field, value in fields.items():
+            setattr(f, field, value)
+        f.symbols = symbols
+        f.assigned = assigned
+
+    t.deferred.extend(nested)
+    t.node.dependencies |= dependencies
+    t.ctx.unresolved.extend(unresolved)
+    for name, n in counters.items():
+        stats.count(name, n)
+
+
+def link_sharded(
+    root_package: Package,
+    jobs: int = 0,
+    stats: Stats | None = None
+) -> Ctx:
+    """Связывание с разрешением отложенных функций в нескольких процессах.
+
+    Модули связываются в текущем процессе; функции каждого модуля
+    связываются в дочернем процессе, результаты переносятся обратно.
+    Без fork, либо при jobs == 1, выполняется обычное связывание
+
+    Args:
+        jobs: Число процессов; 0 и меньше - по числу ядер"""
+    if stats is None:
+        stats = Stats()
+
+    if jobs == 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return link(root_package, stats=stats)
+
+    ctx = link_modules(root_package, stats)
+
+    logger.info("resolving deferred (sharded)")
+
+    with stats.stage("deferred resolution"):
+        index = ExportIndex(root_package)
+        linkers = ctx.linkers
+
+        # Объекты дерева, унаследованные при fork, не просматриваются
+        # сборщиком мусора дочерних процессов; в текущем процессе
+        # сборка откладывается до конца переноса результатов, так как
+        # каждый полный проход просматривает все дерево
+        gc.freeze()
+        gc.disable()
+
+        max_workers = jobs if jobs > 0 else None
+        try:
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=init_worker,
+                initargs=(linkers, index)
+            ) as executor:
+                workers = max_workers or os.cpu_count() or 1
+                chunksize = max(1, len(linkers) // (workers * 4))
+                for t, data in zip(
+                    linkers,
+                    executor.map(
+                        resolve_shard, range(len(linkers)),
+                        chunksize=chunksize
+                    )
+                ):
+                    merge_shard(t, data, index, stats)
+        finally:
+            gc.enable()
+            gc.unfreeze()
+
+    return ctx
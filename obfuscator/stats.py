@@ -0,0 +1,58 @@
+import json
+import time
+from contextlib import contextmanager
+
+
+class Stats:
+    """Время выполнения стадий и счетчики обработанных сущностей"""
+
+    def __init__(self):
+        self.timings = dict[str, float]()
+        """Время выполнения стадий в секундах, в порядке выполнения"""
+
+        self.counters = dict[str, int]()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Замер времени выполнения стадии name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = (
+                self.timings.get(name, 0.0) + time.perf_counter() - start
+            )
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self):
+        result = {
+            "timings": dict(self.timings),
+            "counters": dict(self.counters),
+        }
+        lookups = self.counters.get("lookups", 0)
+        if lookups > 0:
+            result["lookup_hit_rate"] = (
+                self.counters.get("lookup hits", 0) / lookups
+            )
+        return result
+
+    def summary(self) -> str:
+        """Сводка в виде текста"""
+        lines = list[str]()
+        for name, seconds in self.timings.items():
+            lines.append(f"{name:<28}{seconds:>12.3f} s")
+        lines.append(f"{'total':<28}{sum(self.timings.values()):>12.3f} s")
+        lines.append("")
+        for name, value in self.counters.items():
+            lines.append(f"{name:<28}{value:>12}")
+        hit_rate = self.as_dict().get("lookup_hit_rate")
+        if hit_rate is not None:
+            lines.append(f"{'lookup hit rate':<28}{hit_rate:>12.1%}")
+        return "\n".join(lines)
+
+    def dump(self, path: str):
+        """Запись в файл path в формате JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, indent=2)
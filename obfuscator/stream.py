@@ -0,0 +1,168 @@
+import ast
+from pathlib import Path
+from .types import (
+    Package, Module, ClassDef, FunctionDef, AsyncFunctionDef, Name,
+    init_scope
+)
+from .load import FUNCTION_FIELDS, function_defs, strip_functions
+from .link import link_modules
+from .obfuscate import renamed_nodes, own_members, is_renamed
+from .names import NameGenerator, SequentialNameGenerator
+from .bytecode import Bytecode
+from .minify import Minifier
+from .emit import copy, write_module, module_files, remove_stale
+from .stats import Stats
+
+
+def restore_functions(
+    node: Module,
+    functions: list[FunctionDef | AsyncFunctionDef]
+):
+    """Восстановление тел функций модуля повторным разбором его исходного
+    кода. Функции сопоставляются по позиции определения"""
+    assert node.source_path is not None
+    with open(node.source_path, "rb") as f:
+        parsed = ast.parse(f.read())
+
+    by_position = {
+        (f.lineno, f.col_offset): f for f in function_defs(parsed)
+    }
+    for f in functions:
+        original = by_position[(f.lineno, f.col_offset)]
+        for field in FUNCTION_FIELDS:
+            if hasattr(original, field):
+                setattr(f, field, getattr(original, field))
+
+
+def free_functions(functions: list[FunctionDef | AsyncFunctionDef]):
+    """Освобождение тел и таблиц символов функций после записи модуля"""
+    strip_functions(functions)
+    for f in functions:
+        init_scope(f)
+
+
+def local_renamed_nodes(
+    functions: list[FunctionDef | AsyncFunctionDef]
+) -> list[FunctionDef | AsyncFunctionDef | ClassDef | Name]:
+    """Сущности, определенные внутри функций functions, имена которых
+    подлежат обфускации, в порядке обхода"""
+    result = list[FunctionDef | AsyncFunctionDef | ClassDef | Name]()
+    visited = set[FunctionDef | AsyncFunctionDef | ClassDef | Name]()
+
+    stack = list[FunctionDef | AsyncFunctionDef | ClassDef](
+        reversed(functions)
+    )
+    while len(stack) > 0:
+        scope = stack.pop()
+        children = list[FunctionDef | AsyncFunctionDef | ClassDef]()
+
+        for e in own_members(scope):
+            # Импортированные сущности определены в других модулях
+            if not isinstance(
+                e, FunctionDef | AsyncFunctionDef | ClassDef | Name
+            ) or e.owner is not scope or e in visited:
+                continue
+            visited.add(e)
+
+            if is_renamed(e):
+                result.append(e)
+            if not isinstance(e, Name):
+                children.append(e)
+
+        stack.extend(reversed(children))
+
+    return result
+
+
+def stream(
+    root_package: Package,
+    dst_dir_path: Path,
+    generator: NameGenerator | None = None,
+    stats: Stats | None = None,
+    bytecode: Bytecode | None = None,
+    minifier: Minifier | None = None
+):
+    """Обфускация и запись с ограниченным потреблением памяти.
+
+    Дерево пакетов должно быть построено load(..., strip=True): в памяти
+    находятся инструкции уровня модулей и классов и таблицы их символов.
+    Модули связываются и переименовываются без тел функций, затем каждый
+    модуль по очереди разбирается повторно, его функции связываются
+    и переименовываются, модуль записывается, а тела функций
+    освобождаются"""
+    if generator is None:
+        generator = SequentialNameGenerator()
+    if stats is None:
+        stats = Stats()
+
+    ctx = link_modules(root_package, stats)
+
+    # Индексы пакетов перестраиваются только после записи всех модулей,
+    # так как импорты в функциях разрешаются по исходным именам
+    with stats.stage("rename"):
+        for node in root_package.walk():
+            generator.reserve(node.identifiers)
+
+        renamed = renamed_nodes(root_package)
+        stats.count("renamed", len(renamed))
+        for e in renamed:
+            e.name_ptr.data = generator()
+
+    # Пути директории назначения, принадлежащие сборке
+    kept = set[Path]()
+
+    with stats.stage("emit"):
+        for p in root_package.walk_packages():
+            dst_path = dst_dir_path / "/".join(s.data for s in p.parts()[1:])
+            dst_path.mkdir(parents=True, exist_ok=True)
+            kept.add(dst_path)
+
+            for name, other_file in p.other_files.items():
+                copy(other_file, dst_path/name)
+                kept.add(dst_path/name)
+                stats.count("copied files")
+
+    for t in ctx.linkers:
+        node = t.node
+        assert isinstance(node, Module)
+        functions = list(t.deferred)
+
+        with stats.stage("parse"):
+            restore_functions(node, functions)
+
+        with stats.stage("deferred resolution"):
+            t.resolve_deferred()
+
+        if minifier is not None:
+            with stats.stage("minify"):
+                minifier(node, stats)
+
+        with stats.stage("rename"):
+            renamed = local_renamed_nodes(functions)
+            stats.count("renamed", len(renamed))
+            for e in renamed:
+                e.name_ptr.data = generator()
+
+        with stats.stage("emit"):
+            path = dst_dir_path / (
+                "/".join(s.data for s in node.parts()[1:]) + ".py"
+            )
+            for file_path in module_files(path, bytecode):
+                if file_path.parent not in kept:
+                    # __pycache__
+                    file_path.parent.mkdir(exist_ok=True)
+                    kept.add(file_path.parent)
+                kept.add(file_path)
+            write_module(node, path, bytecode)
+            stats.count("written modules")
+
+        # Вложенные функции добавлены в список при связывании
+        # и освобождаются вместе с внешними
+        del t.deferred[len(functions):]
+        free_functions(functions)
+
+    with stats.stage("emit"):
+        stats.count("removed files", remove_stale(dst_dir_path, kept))
+
+    for package in root_package.walk_packages():
+        package.reindex()
@@ -1,20 +1,51 @@
 import ast
 from pathlib import Path
 from typing import Generator
-from collections import UserString
+from .artifact import ArchiveMember
 
 
-class Name(ast.expr):
+def init_scope(
+    node: "Module | ClassDef | FunctionDef | AsyncFunctionDef"
+):
+    """Создает пустую таблицу символов области видимости node.
+
+    symbols - имена, связанные определениями (классы, функции, импорты,
+    аргументы), перекрывают имена родительских областей;
+    assigned - имена, связанные только присваиванием, видны лишь если
+    ни одна из родительских областей не содержит такого имени.
+    Ключи - исходные (необфусцированные) имена."""
+    node.symbols = dict[
+        str,
+        Package | Module | ClassDef | FunctionDef | AsyncFunctionDef
+        | Name | arg | alias
+    ]()
+    node.assigned = dict[str, Name]()
+
+
+class NameCell:
+    """Ячейка имени, общая для сущности и всех ссылок на нее.
+    Переименование сущности - изменение data"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: str):
+        self.data = data
+
+    def __repr__(self):
+        return f"NameCell({self.data!r})"
+
+
+class Name(ast.Name):
 
     def __init__(
         self,
         owner: "Module | ClassDef | FunctionDef | AsyncFunctionDef",
-        id: str | UserString,
+        id: str | NameCell,
         ctx: ast.expr_context
     ):
         self.owner = owner
         if isinstance(id, str):
-            id = UserString(id)
+            id = NameCell(id)
         self.name_ptr = id
         self.ctx = ctx
 
@@ -31,33 +62,51 @@ class Package:
             owner: Если есть родитель, пакет считается подпакетом
             name: Имя пакета"""
         self.owner = owner
-        self.name_ptr = UserString(name)
+        self.name_ptr = NameCell(name)
+        self._parts: tuple[NameCell, ...] | None = None
 
-        self.entries = set[Package | Module]()
-        """Содержащиеся в пакете модули или подпакеты"""
+        self.entries_by_name = dict[str, Package | Module]()
+        """Содержащиеся в пакете модули или подпакеты по текущему имени,
+        в порядке добавления. После переименования сущностей должен быть
+        перестроен вызовом reindex"""
 
-        self.other_files = set[Path]()
-        """Иные файлы"""
+        self.other_files = dict[str, Path | bytes | ArchiveMember]()
+        """Иные файлы: путь к файлу, его содержимое или ссылка на файл
+        исходного архива по имени файла"""
 
     def add_module(self, name: str, node: ast.Module):
         """Создает, добавляет и возвращает модуль с именем name"""
-        assert next(
-            (e for e in self.entries if e.name_ptr == name),
-            None
-        ) is None
+        assert name not in self.entries_by_name
         m = Module(owner=self, name=name, **node.__dict__)
-        self.entries.add(m)
+        self.add_entry(m)
         return m
 
+    @property
+    def entries(self):
+        """Содержащиеся в пакете модули или подпакеты"""
+        return self.entries_by_name.values()
+
+    def add_entry(self, e: "Package | Module"):
+        """Добавляет модуль или подпакет в пакет"""
+        self.entries_by_name[e.name_ptr.data] = e
+
+    def remove_entry(self, e: "Package | Module"):
+        """Удаляет модуль или подпакет из пакета"""
+        key = e.name_ptr.data
+        if self.entries_by_name.get(key) is not e:
+            # Индекс устарел
+            key = next(k for k, v in self.entries_by_name.items() if v is e)
+        del self.entries_by_name[key]
+
+    def reindex(self):
+        """Перестраивает индекс entries_by_name по текущим именам,
+        сохраняя порядок"""
+        self.entries_by_name = {e.name_ptr.data: e for e in self.entries}
+
     def try_get_module(self, name: str):
         """Возвращает модуль, либо None"""
-        return next(
-            (
-                e for e in self.entries
-                if isinstance(e, Module) and e.name_ptr == name
-            ),
-            None
-        )
+        e = self.entries_by_name.get(name)
+        return e if isinstance(e, Module) else None
 
     def get_or_add_package(self, name: str):
         """Возможно создает, и возвращает подпакет с именем name"""
@@ -66,28 +115,26 @@ class Package:
             assert isinstance(p, Package)
             return p
         p = Package(owner=self, name=name)
-        self.entries.add(p)
+        self.add_entry(p)
         return p
 
     def get(self, name: str):
         """Получение подпакета или модуля по имени"""
-        return next(e for e in self.entries if e.name_ptr == name)
+        return self.entries_by_name[name]
 
     def try_get(self, name: str):
-        return next(
-            (e for e in self.entries if e.name_ptr == name),
-            None
-        )
-
-    def parts(self) -> list[UserString]:
-        """Возвращает в виде списка имена пакетов по иерархии,
-        начиная с корневого пакета"""
-        if self.owner is not None:
-            result = self.owner.parts()
-        else:
-            result = list()
-        result.append(self.name_ptr)
-        return result
+        return self.entries_by_name.get(name)
+
+    def parts(self) -> tuple[NameCell, ...]:
+        """Возвращает ячейки имен пакетов по иерархии, начиная с корневого
+        пакета. Ячейки не меняются при переименовании, поэтому результат
+        вычисляется один раз"""
+        if self._parts is None:
+            if self.owner is not None:
+                self._parts = (*self.owner.parts(), self.name_ptr)
+            else:
+                self._parts = (self.name_ptr,)
+        return self._parts
 
     def walk(self) -> Generator["Module", None, None]:
         """Рекурсивное получение всех модулей, и модулей подпакетов"""
@@ -106,25 +153,45 @@ class Package:
 
 class Module(ast.Module):
     owner: Package
-    name_ptr: UserString
+    name_ptr: NameCell
 
     def __init__(self, owner: Package, name: str, *args, **kwargs):
         self.owner = owner
-        self.name_ptr = UserString(name)
+        self.name_ptr = NameCell(name)
+        self._parts: tuple[NameCell, ...] | None = None
+        init_scope(self)
+
+        self.source_hash: str | None = None
+        """Хеш исходного кода модуля"""
+
+        self.source_path: Path | None = None
+        """Путь к файлу исходного кода модуля, если он известен"""
+
+        self.dependencies = set[Module]()
+        """Модули, сущности которых используются данным модулем"""
+
+        self.identifiers = set[str]()
+        """Имена, встречающиеся в исходном коде модуля"""
+
         super().__init__(*args, **kwargs)
 
     def owning_module(self):
         return self
 
-    def parts(self):
-        return self.owner.parts() + [self.name_ptr]
+    def parts(self) -> tuple[NameCell, ...]:
+        if self._parts is None:
+            self._parts = (*self.owner.parts(), self.name_ptr)
+        return self._parts
 
     def move_to(self, package: Package):
         prev_owner = self.owner
-        prev_owner.entries.remove(self)
+        prev_owner.remove_entry(self)
 
         self.owner = package
-        package.entries.add(self)
+        package.add_entry(self)
+        # Путь модуля изменился; новый кортеж также делает устаревшими
+        # пути импортов, вычисленные по прежнему (см. ImportFrom)
+        self._parts = None
 
 
 class alias:
@@ -137,7 +204,7 @@ class alias:
     ):
         self.owner = owner
         self.entity = entity
-        self.name_ptr = UserString(asname)
+        self.name_ptr = NameCell(asname)
 
     @property
     def name(self):
@@ -148,7 +215,7 @@ class alias:
         return None
 
 
-class ImportFrom(ast.stmt):
+class ImportFrom(ast.ImportFrom):
 
     def __init__(
         self,
@@ -158,6 +225,13 @@ class ImportFrom(ast.stmt):
         self.owner = owner
         self.what = what
 
+        # Уровень и ячейки имен пути импорта, и пути модулей,
+        # по которым они вычислены
+        self._path: tuple[int, tuple[NameCell, ...]] | None = None
+        self._path_key: tuple[
+            tuple[NameCell, ...], tuple[NameCell, ...]
+        ] | None = None
+
     def from_where(self):
         first = self.what[0]
         if isinstance(first, alias):
@@ -167,51 +241,62 @@ class ImportFrom(ast.stmt):
         assert isinstance(_from, Package | Module)
         return _from
 
-    def _branch_path(self):
+    def _import_path(self) -> tuple[int, tuple[NameCell, ...]]:
+        """Уровень относительного импорта и ячейки имен пути от общего
+        пакета. Пересчитывается, только если путь модуля-владельца или
+        импортируемого модуля изменился (см. Module.move_to)"""
         owner_path = self.owner.owning_module().parts()
         from_path = self.from_where().parts()
 
-        result = list[UserString]()
-        for b, f in zip(owner_path, from_path):
-            if b != f:
-                break
-            result.append(b)
+        key = self._path_key
+        if (
+            self._path is None or key is None
+            or key[0] is not owner_path or key[1] is not from_path
+        ):
+            branch_path_len = 0
+            for b, f in zip(owner_path, from_path):
+                # Ячейки имен пакетов уникальны, достаточно сравнить их
+                if b is not f:
+                    break
+                branch_path_len += 1
+
+            self._path = (
+                len(owner_path) - branch_path_len,
+                from_path[branch_path_len:]
+            )
+            self._path_key = (owner_path, from_path)
 
-        return result
+        return self._path
 
     @property
     def level(self):
-        branch_path_len = len(self._branch_path())
-        owner_path_len = len(self.owner.owning_module().parts())
-        diff = owner_path_len - branch_path_len
-        assert diff >= 0
-        return diff
+        return self._import_path()[0]
 
     @property
     def module(self):
-        from_path = self.from_where().parts()
-        branch_path = self._branch_path()
-        result = from_path[len(branch_path):]
-        result = ".".join(s.data for s in result) if len(result) else None
-        return result
+        result = self._import_path()[1]
+        return ".".join(s.data for s in result) if len(result) else None
 
     @property
     def names(self):
         return [
-            ast.alias(
-                name=e.name_ptr.data,
-                asname=None
-            ) if not isinstance(e, alias)
-            else ast.alias(
-                name=e.entity.name_ptr.data,
-                asname=e.name_ptr.data
+            ast.copy_location(
+                ast.alias(
+                    name=e.name_ptr.data,
+                    asname=None
+                ) if not isinstance(e, alias)
+                else ast.alias(
+                    name=e.entity.name_ptr.data,
+                    asname=e.name_ptr.data
+                ),
+                self
             )
             for e in self.what
         ]
 
 
 class ClassDef(ast.ClassDef):
-    name_ptr: UserString
+    name_ptr: NameCell
 
     def __init__(
         self,
@@ -220,6 +305,7 @@ class ClassDef(ast.ClassDef):
         **kwargs
     ):
         self.owner = owner
+        init_scope(self)
         super().__init__(*args, **kwargs)
 
     @property
@@ -228,7 +314,7 @@ class ClassDef(ast.ClassDef):
 
     @name.setter
     def name(self, value: str):
-        self.name_ptr = UserString(value)
+        self.name_ptr = NameCell(value)
 
     def owning_module(self):
         o = self.owner
@@ -238,7 +324,7 @@ class ClassDef(ast.ClassDef):
 
 
 class FunctionDef(ast.FunctionDef):
-    name_ptr: UserString
+    name_ptr: NameCell
 
     def __init__(
         self,
@@ -247,6 +333,7 @@ class FunctionDef(ast.FunctionDef):
         **kwargs
     ):
         self.owner = owner
+        init_scope(self)
         super().__init__(*args, **kwargs)
 
     @property
@@ -255,7 +342,7 @@ class FunctionDef(ast.FunctionDef):
 
     @name.setter
     def name(self, value: str):
-        self.name_ptr = UserString(value)
+        self.name_ptr = NameCell(value)
 
     def owning_module(self):
         o = self.owner
@@ -265,7 +352,7 @@ class FunctionDef(ast.FunctionDef):
 
 
 class AsyncFunctionDef(ast.AsyncFunctionDef):
-    name_ptr: UserString
+    name_ptr: NameCell
 
     def __init__(
         self,
@@ -274,6 +361,7 @@ class AsyncFunctionDef(ast.AsyncFunctionDef):
         **kwargs
     ):
         self.owner = owner
+        init_scope(self)
         super().__init__(*args, **kwargs)
 
     @property
@@ -282,7 +370,7 @@ class AsyncFunctionDef(ast.AsyncFunctionDef):
 
     @name.setter
     def name(self, value: str):
-        self.name_ptr = UserString(value)
+        self.name_ptr = NameCell(value)
 
     def owning_module(self):
         o = self.owner
@@ -302,22 +390,41 @@ class arg(ast.arg):
 
     @arg.setter
     def arg(self, value: str):
-        self.name_ptr = UserString(value)
+        self.name_ptr = NameCell(value)
+
+
+class ExceptHandler(ast.ExceptHandler):
+    """Обработчик исключения; имя "as" разделяет ячейку с сущностью
+    (см. Name), связанной в области видимости"""
 
+    def __init__(
+        self,
+        type: ast.expr | None,
+        name: NameCell,
+        body: list[ast.stmt]
+    ):
+        self.type = type
+        self.name_ptr = name
+        self.body = body
+
+    @property
+    def name(self):
+        return self.name_ptr.data
 
-class Attribute(ast.expr):
+
+class Attribute(ast.Attribute):
 
     def __init__(
         self,
         left: ast.expr | Package | Module | ClassDef
         | FunctionDef | AsyncFunctionDef | Name | arg | alias,
-        right: str | UserString | Package | Module | ClassDef
+        right: str | NameCell | Package | Module | ClassDef
         | FunctionDef | AsyncFunctionDef | Name | arg | alias,
         ctx: ast.expr_context
     ):
         self.left = left
         if isinstance(right, str):
-            right = UserString(right)
+            right = NameCell(right)
         self.right = right
         self.ctx = ctx
 
@@ -326,8 +433,8 @@ class Attribute(ast.expr):
         return self.name_ptr.data
 
     @property
-    def name_ptr(self) -> UserString:
-        if isinstance(self.right, UserString):
+    def name_ptr(self) -> NameCell:
+        if isinstance(self.right, NameCell):
             return self.right
         else:
             return self.right.name_ptr
@@ -340,6 +447,8 @@ class Attribute(ast.expr):
             e,
             Package | Module | ClassDef | FunctionDef | AsyncFunctionDef | Name
         ):
-            return ast.Name(id=e.name_ptr.data, ctx=ast.Load())
+            return ast.copy_location(
+                ast.Name(id=e.name_ptr.data, ctx=ast.Load()), self
+            )
 
         return e
@@ -0,0 +1,252 @@
+import ast
+import time
+import logging
+from pathlib import Path
+from .types import (
+    Package, Module, ClassDef, FunctionDef, AsyncFunctionDef, Name,
+    init_scope
+)
+from .load import load, parse, source_files
+from .link import Ctx, link
+from .obfuscate import renamed_nodes, qualified_name, entity_module
+from .names import NameGenerator
+from .emit import emit, copy, write
+from .stats import Stats
+
+
+logger = logging.getLogger(__name__)
+
+
+class Watcher:
+    """Повторная обфускация изменившихся модулей без полной пересборки.
+
+    Связанное дерево пакетов хранится в памяти между изменениями.
+    Измененный модуль и модули, использующие его сущности прямо или
+    через другие модули, разбираются и связываются заново, остальные
+    модули сохраняют свои таблицы символов. Обфусцированные имена
+    закреплены за полными исходными именами сущностей, поэтому
+    не меняются от сборки к сборке"""
+
+    def __init__(
+        self,
+        src_dir_path: Path,
+        dst_dir_path: Path,
+        generator: NameGenerator,
+        jobs: int = 1
+    ):
+        self.src_dir_path = src_dir_path
+        self.dst_dir_path = dst_dir_path
+        self.generator = generator
+        self.jobs = jobs
+
+        self.root_package: Package | None = None
+
+        self.names = dict[str, str]()
+        """Обфусцированные имена по полным исходным именам сущностей"""
+
+        self.renamed = list[tuple[
+            Package | Module | ClassDef | FunctionDef | AsyncFunctionDef
+            | Name,
+            str
+        ]]()
+        """Переименованные сущности дерева и их полные исходные имена"""
+
+        self.signatures = dict[Path, tuple[int, int]]()
+        """Размер и время изменения файлов исходной директории"""
+
+    def scan(self) -> dict[Path, tuple[int, int]]:
+        result = dict[Path, tuple[int, int]]()
+        for file_path, _ in source_files(self.src_dir_path):
+            stat = file_path.stat()
+            result[file_path] = (stat.st_size, stat.st_mtime_ns)
+        return result
+
+    def build(self):
+        """Полная сборка"""
+        stats = Stats()
+        self.signatures = self.scan()
+
+        root_package = load(self.src_dir_path, jobs=self.jobs, stats=stats)
+        link(root_package, stats=stats)
+
+        self.root_package = root_package
+        self.renamed.clear()
+
+        # Имена, совпавшие с новыми именами исходного кода, выдаются заново
+        identifiers = set[str]()
+        for node in root_package.walk():
+            identifiers |= node.identifiers
+        self.generator.reserve(identifiers)
+        self.names = {
+            qualified: name for qualified, name in self.names.items()
+            if name not in identifiers
+        }
+        self.rename(None, stats)
+
+        emit(root_package, self.dst_dir_path, jobs=self.jobs, stats=stats)
+
+        logger.info(
+            "built %d modules in %.3f s",
+            stats.counters.get("written modules", 0),
+            sum(stats.timings.values())
+        )
+
+    def rename(self, modules: set[Module] | None, stats: Stats):
+        """Переименование всех сущностей дерева. Сущности модулей modules
+        (всех модулей, если None) собираются заново, обфусцированные имена
+        прочих известны. Имена должны быть исходными (см. restore)"""
+        assert self.root_package is not None
+
+        with stats.stage("rename"):
+            if modules is not None:
+                self.renamed = [
+                    (node, qualified) for node, qualified in self.renamed
+                    if entity_module(node) not in modules
+                ]
+            self.renamed.extend(
+                (node, qualified_name(node))
+                for node in renamed_nodes(self.root_package, modules)
+            )
+
+            for node, qualified in self.renamed:
+                name = self.names.get(qualified)
+                if name is None:
+                    name = self.names[qualified] = self.generator()
+                node.name_ptr.data = name
+
+    def restore(self):
+        """Возврат исходных имен сущностям, для повторного связывания"""
+        assert self.root_package is not None
+
+        for node, qualified in self.renamed:
+            node.name_ptr.data = qualified.rsplit(".", 1)[-1]
+        for package in self.root_package.walk_packages():
+            package.reindex()
+
+    def update(self, edited_paths: list[Path]):
+        """Повторная обфускация модулей, исходный код которых изменился,
+        и модулей, использующих их сущности"""
+        assert self.root_package is not None
+        stats = Stats()
+
+        by_path = {
+            node.source_path: node for node in self.root_package.walk()
+        }
+        edited = {by_path[path] for path in edited_paths}
+
+        # Связанный заново модуль получает новые сущности, поэтому
+        # заново связываются и использующие его модули, в том числе
+        # через цепочки реэкспорта (from .m import X в __init__)
+        dependents = dict[Module, set[Module]]()
+        for node in self.root_package.walk():
+            for d in node.dependencies:
+                dependents.setdefault(d, set()).add(node)
+        relinked = set(edited)
+        stack = list(edited)
+        while len(stack) > 0:
+            for node in dependents.get(stack.pop(), ()):
+                if node not in relinked:
+                    relinked.add(node)
+                    stack.append(node)
+
+        with stats.stage("parse"):
+            parsed = {node: parse(node.source_path) for node in relinked}
+
+        # Новые имена в исходном коде могут совпасть с уже выданными
+        # обфусцированными, тогда требуется полная сборка
+        obfuscated = set(self.names.values())
+        for node in edited:
+            if not parsed[node][2].isdisjoint(obfuscated):
+                logger.info("identifier clash, rebuilding")
+                self.build()
+                return
+            self.generator.reserve(parsed[node][2])
+
+        self.restore()
+
+        for node, (tree, source_hash, identifiers) in parsed.items():
+            node.body = tree.body
+            node.type_ignores = tree.type_ignores
+            init_scope(node)
+            node.dependencies = set[Module]()
+            node.source_hash = source_hash
+            node.identifiers = identifiers
+
+        # Модули вне relinked считаются связанными; их таблицы символов
+        # не изменились
+        ctx = Ctx(root_package=self.root_package, stats=stats)
+        ctx.linked.update(
+            node for node in self.root_package.walk()
+            if node not in relinked
+        )
+        with stats.stage("link"):
+            for node in self.root_package.walk():
+                if node in relinked:
+                    ctx.require(node)
+        with stats.stage("deferred resolution"):
+            for t in ctx.linkers:
+                t.resolve_deferred()
+
+        self.rename(relinked, stats)
+
+        with stats.stage("emit"):
+            for node in self.root_package.walk():
+                if node not in relinked:
+                    continue
+                path = "/".join(s.data for s in node.parts()[1:])
+                write(
+                    self.dst_dir_path/f"{path}.py",
+                    ast.unparse(node).encode("utf-8")
+                )
+
+        logger.info(
+            "rewrote %d modules (%d edited) in %.3f s",
+            len(relinked), len(edited), sum(stats.timings.values())
+        )
+
+    def poll(self):
+        """Проверка исходной директории и обработка изменений"""
+        assert self.root_package is not None
+
+        signatures = self.scan()
+        if signatures.keys() != self.signatures.keys():
+            # Добавление и удаление файлов меняет состав пакетов
+            logger.info("files added or removed, rebuilding")
+            self.build()
+            return
+
+        changed = [
+            path for path, signature in signatures.items()
+            if self.signatures[path] != signature
+        ]
+        if len(changed) == 0:
+            return
+        self.signatures = signatures
+
+        edited = [path for path in changed if path.suffix == ".py"]
+        for path in changed:
+            if path.suffix != ".py":
+                rel_path = path.relative_to(self.src_dir_path)
+                copy(path, self.dst_dir_path/rel_path)
+        if len(edited) > 0:
+            self.update(edited)
+
+    def run(self, interval: float):
+        """Сборка и отслеживание изменений до прерывания (Ctrl+C)"""
+        logger.warning("watching %s", self.src_dir_path)
+        while True:
+            try:
+                if self.root_package is not None:
+                    self.poll()
+                elif self.scan() != self.signatures:
+                    self.build()
+            except SyntaxError as e:
+                # Модули разбираются до изменения дерева, оно не затронуто
+                logger.error("%s:%s: %s", e.filename, e.lineno, e.msg)
+            except Exception:
+                # Ошибка в исходном коде; дерево могло остаться частично
+                # связанным, поэтому после следующего изменения
+                # выполняется полная сборка
+                logger.exception("build failed")
+                self.root_package = None
+            time.sleep(interval)
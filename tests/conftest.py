@@ -0,0 +1,38 @@
+import sys
+import subprocess
+from pathlib import Path
+import pytest
+
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture
+def obfuscator():
+    """Запуск python -m obfuscator в отдельном процессе"""
+    def run(*args: str | Path) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, "-m", "obfuscator", *map(str, args)],
+            cwd=ROOT, capture_output=True, text=True
+        )
+    return run
+
+
+@pytest.fixture
+def import_all():
+    """Импорт всех модулей пакета в отдельном процессе.
+    path - директория либо архив, содержащие пакет"""
+    def run(path: Path, package: str = "pkg") -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [
+                sys.executable, "-c",
+                "import importlib, pkgutil, sys\n"
+                f"sys.path.insert(0, {str(path)!r})\n"
+                f"p = importlib.import_module({package!r})\n"
+                "prefix = p.__name__ + '.'\n"
+                "for m in pkgutil.walk_packages(p.__path__, prefix):\n"
+                "    importlib.import_module(m.name)\n"
+            ],
+            capture_output=True, text=True
+        )
+    return run
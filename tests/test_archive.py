@@ -0,0 +1,130 @@
+import csv
+import base64
+import hashlib
+import zipfile
+import sys
+import tarfile
+import subprocess
+from pathlib import Path
+
+
+SOURCES = {
+    "__init__.py": "from .a import f\n",
+    "a.py": "def f(x):\n    return [i * x for i in range(3)]\n",
+    "b.py": "from . import f\n\nprint(f(2))\n",
+    "cli.py": "from . import f\n\n\ndef main():\n    print(f(3))\n",
+    "data.txt": "data\n",
+}
+
+
+def write_sources(path: Path):
+    """Запись исходной директории тестового пакета"""
+    for name, source in SOURCES.items():
+        (path/name).parent.mkdir(parents=True, exist_ok=True)
+        (path/name).write_text(source, encoding="utf-8")
+
+
+def test_wheel(tmp_path: Path, obfuscator, import_all):
+    """RECORD колеса перечисляет все файлы с хешами и размерами;
+    повторная сборка дает тот же архив"""
+    write_sources(tmp_path/"src"/"pkg")
+    wheels = [
+        tmp_path/d/"pkg-1.0-py3-none-any.whl" for d in ("first", "second")
+    ]
+    for wheel in wheels:
+        result = obfuscator(tmp_path/"src"/"pkg", wheel)
+        assert result.returncode == 0, result.stderr
+    assert wheels[0].read_bytes() == wheels[1].read_bytes()
+
+    with zipfile.ZipFile(wheels[0]) as z:
+        names = z.namelist()
+        rows = list(csv.reader(
+            z.read("pkg-1.0.dist-info/RECORD").decode("utf-8").splitlines()
+        ))
+        assert sorted(row[0] for row in rows) == sorted(names)
+        for name, record_hash, size in rows:
+            if name == "pkg-1.0.dist-info/RECORD":
+                assert record_hash == size == ""
+                continue
+            data = z.read(name)
+            digest = base64.urlsafe_b64encode(
+                hashlib.sha256(data).digest()
+            ).rstrip(b"=").decode("ascii")
+            assert record_hash == f"sha256={digest}"
+            assert size == str(len(data))
+
+    assert "pkg/data.txt" in names
+    assert "pkg-1.0.dist-info/METADATA" in names
+    assert "pkg-1.0.dist-info/WHEEL" in names
+    result = import_all(wheels[0])
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "[0, 2, 4]\n"
+
+
+def test_zipapp(tmp_path: Path, obfuscator):
+    """Приложение zipapp выполняет точку входа --main"""
+    write_sources(tmp_path/"src"/"pkg")
+    pyz = tmp_path/"app.pyz"
+    result = obfuscator(tmp_path/"src"/"pkg", pyz, "--main", "pkg.cli:main")
+    assert result.returncode == 0, result.stderr
+
+    result = subprocess.run(
+        [sys.executable, pyz], capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "[0, 3, 6]\n"
+
+
+def test_distribution_input(tmp_path: Path, obfuscator, import_all):
+    """Колесо и sdist на входе: колесо получает метаданные исходного
+    дистрибутива, точки входа указывают обфусцированные имена"""
+    write_sources(tmp_path/"src"/"pkg")
+    files = sorted(f for f in (tmp_path/"src").rglob("*") if f.is_file())
+    metadata = "Metadata-Version: 2.1\nName: pkg\nVersion: 1.0\n"
+    entry_points = "[console_scripts]\npkg-cli = pkg.cli:main\n"
+
+    wheel = tmp_path/"pkg-1.0-py3-none-any.whl"
+    with zipfile.ZipFile(wheel, "w") as z:
+        for f in files:
+            z.write(f, f.relative_to(tmp_path/"src").as_posix())
+        z.writestr(
+            "pkg-1.0.dist-info/METADATA", metadata + "Requires-Dist: six\n"
+        )
+        z.writestr("pkg-1.0.dist-info/entry_points.txt", entry_points)
+
+    sdist = tmp_path/"pkg-1.0.tar.gz"
+    with tarfile.open(sdist, "w:gz") as t:
+        for f in files:
+            t.add(f, f"pkg-1.0/{f.relative_to(tmp_path/'src').as_posix()}")
+        (tmp_path/"setup.py").write_text("")
+        t.add(tmp_path/"setup.py", "pkg-1.0/setup.py")
+
+    result = obfuscator(sdist, tmp_path/"dst"/"pkg")
+    assert result.returncode == 0, result.stderr
+    result = import_all(tmp_path/"dst")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "[0, 2, 4]\n"
+
+    output = tmp_path/"out"/"pkg-1.0-py3-none-any.whl"
+    result = obfuscator(wheel, output)
+    assert result.returncode == 0, result.stderr
+    with zipfile.ZipFile(output) as z:
+        assert b"Requires-Dist: six" in z.read("pkg-1.0.dist-info/METADATA")
+        lines = z.read("pkg-1.0.dist-info/entry_points.txt").splitlines()
+    assert lines[0] == b"[console_scripts]"
+    name, _, spec = lines[1].decode("utf-8").partition(" = ")
+    module, _, attr = spec.partition(":")
+    assert name == "pkg-cli"
+    assert module != "pkg.cli" and attr != "main"
+
+    result = subprocess.run(
+        [
+            sys.executable, "-c",
+            f"import sys; sys.path.insert(0, {str(output)!r})\n"
+            "import importlib\n"
+            f"getattr(importlib.import_module({module!r}), {attr!r})()\n"
+        ],
+        capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "[0, 3, 6]\n"
@@ -0,0 +1,49 @@
+from pathlib import Path
+
+
+SOURCES = {
+    "__init__.py": "from .a import f\n",
+    "a.py": "def f(x):\n    return [i * x for i in range(3)]\n",
+    "b.py": "from . import f\n\nprint(f(2))\n",
+}
+
+
+def write_sources(path: Path):
+    """Запись исходной директории тестового пакета"""
+    for name, source in SOURCES.items():
+        (path/name).parent.mkdir(parents=True, exist_ok=True)
+        (path/name).write_text(source, encoding="utf-8")
+
+
+def test_sourceless(tmp_path: Path, obfuscator, import_all):
+    """Пакет только из байткода загружается и выполняется"""
+    write_sources(tmp_path/"src"/"pkg")
+    dst = tmp_path/"dst"
+    result = obfuscator(tmp_path/"src"/"pkg", dst/"pkg", "--sourceless")
+    assert result.returncode == 0, result.stderr
+
+    assert list(dst.rglob("*.py")) == []
+    assert len(list(dst.rglob("*.pyc"))) == 3
+    result = import_all(dst)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "[0, 2, 4]\n"
+
+
+def test_bytecode_loaded(tmp_path: Path, obfuscator, import_all):
+    """Интерпретатор загружает записанный байткод, а не компилирует
+    исходный код: байткод без проверки по хешу используется
+    и после изменения исходного кода"""
+    write_sources(tmp_path/"src"/"pkg")
+    dst = tmp_path/"dst"
+    result = obfuscator(
+        tmp_path/"src"/"pkg", dst/"pkg",
+        "--bytecode", "--invalidation", "unchecked-hash"
+    )
+    assert result.returncode == 0, result.stderr
+    assert len(list(dst.rglob("__pycache__/*.pyc"))) == 3
+
+    for path in dst.rglob("*.py"):
+        path.write_text("raise ImportError\n")
+    result = import_all(dst)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "[0, 2, 4]\n"
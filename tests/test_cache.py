@@ -0,0 +1,59 @@
+import sys
+import subprocess
+from pathlib import Path
+from obfuscator.load import load
+from obfuscator.link import link
+from obfuscator.obfuscate import obfuscate
+from obfuscator.emit import emit
+from obfuscator.cache import BuildCache
+
+
+def build(src: Path, dst: Path, cache_path: Path):
+    """Сборка с кэшем, как python -m obfuscator --cache"""
+    root_package = load(src)
+    link(root_package)
+    cache = BuildCache(cache_path)
+    cache.update(root_package)
+    obfuscate(root_package, names=cache.names)
+    emit(root_package, dst, cache=cache)
+    cache.save()
+
+
+def test_cached_name_clash(tmp_path: Path):
+    """Новое имя в исходном коде, совпавшее с обфусцированным именем
+    из кэша, не затеняет сущность с этим именем"""
+    src = tmp_path/"src"/"pkg"
+    dst = tmp_path/"dst"
+    src.mkdir(parents=True)
+    (src/"__init__.py").write_text("from .m import f, g\n")
+    (src/"m.py").write_text(
+        "def f(x):\n"
+        "    return x + 1\n\n\n"
+        "def g(y):\n"
+        "    return f(y)\n"
+    )
+    build(src, dst/"pkg", tmp_path/"cache")
+
+    # Параметр с обфусцированным именем f
+    cache = BuildCache(tmp_path/"cache")
+    name = cache.names["pkg.m.f"]
+    (src/"m.py").write_text(
+        "def f(x):\n"
+        "    return x + 1\n\n\n"
+        f"def g({name}):\n"
+        f"    return f({name})\n"
+    )
+    build(src, dst/"pkg", tmp_path/"cache")
+
+    cache = BuildCache(tmp_path/"cache")
+    assert cache.names["pkg.m.f"] != name
+    result = subprocess.run(
+        [
+            sys.executable, "-c",
+            "import pkg\n"
+            f"print(getattr(pkg, {cache.names['pkg.m.g']!r})(1))\n"
+        ],
+        cwd=dst, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "2\n"
@@ -0,0 +1,115 @@
+from pathlib import Path
+from obfuscator.load import load
+from obfuscator.link import link
+from obfuscator.obfuscate import obfuscate
+from obfuscator.emit import emit
+from obfuscator.cache import BuildCache
+from obfuscator.stats import Stats
+
+
+def write_sources(path: Path):
+    """Запись исходной директории тестового пакета"""
+    for name, source in {
+        "__init__.py": "from .a import f\n",
+        "a.py": "def f(x):\n    return x\n",
+        "sub/__init__.py": "",
+        "sub/b.py": "from ..a import f\n\nY = f(1)\n",
+        "sub/data.txt": "data\n",
+    }.items():
+        (path/name).parent.mkdir(parents=True, exist_ok=True)
+        (path/name).write_text(source, encoding="utf-8")
+
+
+def build(
+    src: Path, dst: Path, cache_path: Path | None = None, **kwargs
+) -> Stats:
+    """Сборка, как python -m obfuscator [--cache cache_path]"""
+    stats = Stats()
+    root_package = load(src)
+    link(root_package)
+    cache = None
+    if cache_path is not None:
+        cache = BuildCache(cache_path)
+        cache.update(root_package)
+    obfuscate(root_package, names=cache.names if cache else None)
+    emit(root_package, dst, cache=cache, stats=stats, **kwargs)
+    if cache is not None:
+        cache.save()
+    return stats
+
+
+def signatures(path: Path) -> dict[str, tuple[int, int]]:
+    """Номер inode и время изменения файлов директории"""
+    return {
+        f.relative_to(path).as_posix(): (
+            f.stat().st_ino, f.stat().st_mtime_ns
+        )
+        for f in path.rglob("*") if f.is_file()
+    }
+
+
+def contents(path: Path) -> dict[str, bytes]:
+    """Содержимое файлов директории"""
+    return {
+        f.relative_to(path).as_posix(): f.read_bytes()
+        for f in path.rglob("*") if f.is_file()
+    }
+
+
+def test_parallel_emit(tmp_path: Path):
+    """Запись в нескольких процессах и потоках дает те же файлы,
+    что и запись в текущем потоке"""
+    write_sources(tmp_path/"src")
+    build(tmp_path/"src", tmp_path/"serial", jobs=1)
+    build(tmp_path/"src", tmp_path/"parallel", jobs=2)
+    assert len(contents(tmp_path/"serial")) == 5
+    assert contents(tmp_path/"parallel") == contents(tmp_path/"serial")
+
+
+def test_unchanged_files(tmp_path: Path):
+    """Повторная сборка не перезаписывает файлы, содержимое которых
+    не изменилось, и удаляет лишние файлы"""
+    write_sources(tmp_path/"src")
+    dst = tmp_path/"dst"
+    build(tmp_path/"src", dst)
+    before = signatures(dst)
+    (dst/"stale.py").write_text("")
+
+    stats = build(tmp_path/"src", dst)
+    assert signatures(dst) == before
+    assert stats.counters["unchanged files"] == 5
+    assert stats.counters["removed files"] == 1
+
+
+def test_unchanged_modules_cached(tmp_path: Path):
+    """С кэшем сборки неизменившиеся модули не преобразуются
+    в исходный код"""
+    write_sources(tmp_path/"src")
+    dst = tmp_path/"dst"
+    stats = build(tmp_path/"src", dst, tmp_path/"cache")
+    assert stats.counters["written modules"] == 4
+    before = signatures(dst)
+
+    stats = build(tmp_path/"src", dst, tmp_path/"cache")
+    assert stats.counters["written modules"] == 0
+    assert signatures(dst) == before
+
+    (tmp_path/"src"/"a.py").write_text("def f(x):\n    return x + 1\n")
+    # Изменившийся модуль и использующие его модули преобразуются
+    # заново, записывается только изменившийся
+    stats = build(tmp_path/"src", dst, tmp_path/"cache")
+    assert stats.counters["written modules"] == 3
+    changed = [
+        name for name, signature in signatures(dst).items()
+        if before[name] != signature
+    ]
+    assert len(changed) == 1
+    assert b"+ 1" in (dst/changed[0]).read_bytes()
+
+
+def test_hardlink(tmp_path: Path):
+    """Иные файлы связываются жесткими ссылками"""
+    write_sources(tmp_path/"src")
+    build(tmp_path/"src", tmp_path/"dst", hardlink=True)
+    data = next((tmp_path/"dst").rglob("data.txt"))
+    assert data.samefile(tmp_path/"src"/"sub"/"data.txt")
@@ -0,0 +1,37 @@
+from obfuscator.load import load_sources
+from obfuscator.link import link
+from obfuscator.graph import import_graph, strongly_connected_components
+from obfuscator.stats import Stats
+
+
+def test_link_order():
+    """Модули связываются после модулей, из которых импортируют;
+    модули цикла импортов - вместе"""
+    root_package = load_sources("pkg", {
+        "__init__.py": b"from .a import A\n",
+        "a.py": b"from .b import B\n\nA = B\n",
+        "b.py": b"from .c import C\n\nB = C\n",
+        "c.py": b"C = 1\n",
+        "x.py": b"from . import y\n\n\ndef f():\n    return y.g()\n",
+        "y.py": b"from . import x\n\n\ndef g():\n    return x.f\n",
+    })
+    modules = {m.name_ptr.data: m for m in root_package.walk()}
+
+    graph = import_graph(root_package)
+    assert graph[modules["__init__"]] == [modules["a"]]
+    assert graph[modules["x"]] == [modules["y"]]
+    assert graph[modules["c"]] == []
+
+    order = [
+        [m.name_ptr.data for m in component]
+        for component in strongly_connected_components(graph)
+    ]
+    assert order == [["c"], ["b"], ["a"], ["__init__"], ["x", "y"]]
+
+    stats = Stats()
+    ctx = link(root_package, stats=stats)
+    assert [t.node.name_ptr.data for t in ctx.linkers][:4] == [
+        "c", "b", "a", "__init__"
+    ]
+    assert stats.counters["import cycles"] == 1
+    assert ctx.unresolved == []
@@ -0,0 +1,76 @@
+import ast
+import tarfile
+import zipfile
+from pathlib import Path
+from obfuscator.load import load
+from obfuscator.types import Package
+
+
+def write_sources(path: Path):
+    """Запись исходной директории тестового пакета"""
+    for name, source in {
+        "__init__.py": "from .a import f\n",
+        "a.py": "def f(x):\n    return x\n",
+        "sub/__init__.py": "",
+        "sub/b.py": "from ..a import f\n\nY = f(1)\n",
+        "data.txt": "data\n",
+    }.items():
+        (path/name).parent.mkdir(parents=True, exist_ok=True)
+        (path/name).write_text(source, encoding="utf-8")
+
+
+def describe(root_package: Package):
+    """Состав дерева пакетов для сравнения"""
+    return [
+        (
+            [s.data for s in p.parts()],
+            sorted(p.other_files),
+            [
+                (
+                    e.name_ptr.data, ast.dump(e), e.source_hash,
+                    sorted(e.identifiers)
+                )
+                for e in p.entries if not isinstance(e, Package)
+            ]
+        )
+        for p in root_package.walk_packages()
+    ]
+
+
+def test_parallel_load(tmp_path: Path):
+    """Разбор модулей в нескольких процессах дает то же дерево,
+    что и разбор в текущем процессе"""
+    src = tmp_path/"pkg"
+    write_sources(src)
+    assert describe(load(src, jobs=2)) == describe(load(src, jobs=1))
+
+
+def test_archive_load(tmp_path: Path):
+    """Колесо, sdist и zip-архив дают то же дерево, что и директория"""
+    src = tmp_path/"pkg"
+    write_sources(src)
+    files = sorted(f for f in src.rglob("*") if f.is_file())
+
+    wheel = tmp_path/"pkg-1.0-py3-none-any.whl"
+    with zipfile.ZipFile(wheel, "w") as z:
+        for f in files:
+            z.write(f, f.relative_to(tmp_path).as_posix())
+        z.writestr("pkg-1.0.dist-info/METADATA", "Name: pkg\n")
+
+    sdist = tmp_path/"pkg-1.0.tar.gz"
+    with tarfile.open(sdist, "w:gz") as t:
+        for f in files:
+            t.add(f, f"pkg-1.0/{f.relative_to(tmp_path).as_posix()}")
+        (tmp_path/"setup.py").write_text("")
+        t.add(tmp_path/"setup.py", "pkg-1.0/setup.py")
+
+    archive = tmp_path/"src.zip"
+    with zipfile.ZipFile(archive, "w") as z:
+        for f in files:
+            z.write(f, f"src/{f.relative_to(tmp_path).as_posix()}")
+        z.writestr("src/tests/__init__.py", "")
+
+    expected = describe(load(src))
+    assert describe(load(wheel)) == expected
+    assert describe(load(sdist)) == expected
+    assert describe(load(archive, package="src/pkg")) == expected
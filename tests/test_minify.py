@@ -0,0 +1,64 @@
+import ast
+import json
+from pathlib import Path
+
+
+SOURCES = {
+    "__init__.py": '"""Package doc."""\nfrom .a import f\n',
+    "a.py": (
+        '"""Module doc."""\n\n\n'
+        "class C:\n"
+        '    """Class doc."""\n'
+        "    x: int = 1\n\n\n"
+        "def f(n: int) -> int:\n"
+        '    """Function doc."""\n'
+        "    assert n > 0\n"
+        "    total: int = 0\n"
+        "    for i in range(n):\n"
+        "        total += i * C.x\n"
+        "    return total\n"
+    ),
+    "b.py": "from . import f\n\nprint(f(4), f.__annotations__['n'])\n",
+}
+
+
+def test_minify(tmp_path: Path, obfuscator, import_all):
+    """Строки документации, assert и аннотации локальных переменных
+    удаляются, отчет записывается, модули выполняются"""
+    src = tmp_path/"src"/"pkg"
+    dst = tmp_path/"dst"
+    for name, source in SOURCES.items():
+        (src/name).parent.mkdir(parents=True, exist_ok=True)
+        (src/name).write_text(source, encoding="utf-8")
+
+    result = obfuscator(
+        src, dst/"pkg", "--minify", "--strip-asserts",
+        "--minify-report", tmp_path/"report.json"
+    )
+    assert result.returncode == 0, result.stderr
+
+    result = import_all(dst)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "6 <class 'int'>\n"
+
+    sources = [
+        path.read_text(encoding="utf-8") for path in dst.rglob("*.py")
+    ]
+    assert not any("doc." in source for source in sources)
+    nodes = [n for source in sources for n in ast.walk(ast.parse(source))]
+    assert not any(isinstance(n, ast.Assert) for n in nodes)
+    # Аннотации аргументов и класса сохраняются
+    assert sum(isinstance(n, ast.AnnAssign) for n in nodes) == 1
+    assert sum(
+        isinstance(n, ast.arg) and n.annotation is not None for n in nodes
+    ) == 1
+
+    with open(tmp_path/"report.json", encoding="utf-8") as f:
+        report = json.load(f)
+    assert sorted(r["module"] for r in report) == [
+        "pkg.__init__", "pkg.a", "pkg.b"
+    ]
+    for r in report:
+        assert len(r["compile"]) == len(r["load"]) == 2
+        if r["module"] != "pkg.b":
+            assert r["bytes"][1] < r["bytes"][0]
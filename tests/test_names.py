@@ -0,0 +1,40 @@
+import keyword
+from obfuscator.names import SequentialNameGenerator, UuidNameGenerator
+
+
+def test_sequential_names():
+    """Короткие имена по порядку, без повторов и зарезервированных имен"""
+    generator = SequentialNameGenerator()
+    generator.reserve(["_b"])
+    names = [generator() for _ in range(2000)]
+
+    assert names[:3] == ["_a", "_c", "_d"]
+    assert len(set(names)) == len(names)
+    assert "_b" not in names
+    for name in names:
+        assert name.isidentifier() and not keyword.iskeyword(name)
+        assert name == name.lower() and not name.startswith("__")
+    # Имена из одного и двух символов после "_" выдаются раньше
+    # более длинных; "_b" зарезервировано
+    assert [len(name) for name in names[:35 + 36 * 37]] == (
+        [2] * 35 + [3] * 36 * 37
+    )
+
+
+def test_sequential_names_seed():
+    """Последовательность имен определяется зерном"""
+    def names(seed: int | None):
+        generator = SequentialNameGenerator(seed)
+        return [generator() for _ in range(100)]
+
+    assert names(1) == names(1)
+    assert names(1) != names(2)
+    assert names(None) == names(None)
+
+
+def test_uuid_names():
+    """Случайные имена не повторяются"""
+    generator = UuidNameGenerator()
+    names = {generator() for _ in range(100)}
+    assert len(names) == 100
+    assert all(name.isidentifier() for name in names)
@@ -0,0 +1,57 @@
+import json
+from pathlib import Path
+
+
+SOURCES = {
+    "__init__.py": "from .a import used\n",
+    "a.py": (
+        "import functools\n\n\n"
+        "def used(x):\n"
+        "    return helper(x) + 1\n\n\n"
+        "def helper(x):\n"
+        "    return x * 2\n\n\n"
+        "def unused(x):\n"
+        "    return 'unused function'\n\n\n"
+        "class Unused:\n"
+        "    def method(self):\n"
+        "        return 'unused class'\n\n\n"
+        "@functools.lru_cache\n"
+        "def decorated():\n"
+        "    return 'decorated function'\n"
+    ),
+    "cli.py": "from . import used\n\n\ndef main():\n    print(used(3))\n",
+    "orphan.py": "X = 'unused module'\n",
+    "run.py": "from .cli import main\n\nmain()\n",
+}
+
+
+def test_entry(tmp_path: Path, obfuscator, import_all):
+    """Определения и модули, недостижимые из точки входа, удаляются;
+    пакет импортируется и выполняется"""
+    src = tmp_path/"src"/"pkg"
+    dst = tmp_path/"dst"
+    for name, source in SOURCES.items():
+        (src/name).parent.mkdir(parents=True, exist_ok=True)
+        (src/name).write_text(source, encoding="utf-8")
+
+    result = obfuscator(
+        src, dst/"pkg", "--entry", "pkg.run",
+        "--stats-json", tmp_path/"stats.json"
+    )
+    assert result.returncode == 0, result.stderr
+
+    output = "".join(
+        path.read_text(encoding="utf-8") for path in dst.rglob("*.py")
+    )
+    assert "unused" not in output
+    assert "decorated function" in output
+    assert len(list(dst.rglob("*.py"))) == 4
+
+    with open(tmp_path/"stats.json", encoding="utf-8") as f:
+        counters = json.load(f)["counters"]
+    assert counters["removed definitions"] == 2
+    assert counters["removed modules"] == 1
+
+    result = import_all(dst)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "7\n"
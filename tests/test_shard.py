@@ -0,0 +1,84 @@
+import ast
+from pathlib import Path
+from obfuscator.load import load_sources
+from obfuscator.link import link
+from obfuscator.shard import NODE_TYPES, link_sharded
+from obfuscator.obfuscate import obfuscate
+from obfuscator.emit import emit_sources
+from obfuscator.names import SequentialNameGenerator
+
+
+def test_except_handler_jobs(tmp_path: Path, obfuscator, import_all):
+    """Имя обработчика исключения в функции переносится из дочернего
+    процесса при связывании с -j"""
+    src = tmp_path/"src"/"pkg"
+    dst = tmp_path/"dst"
+    src.mkdir(parents=True)
+    (src/"__init__.py").write_text("from .a import f\n")
+    (src/"a.py").write_text(
+        "def f(x):\n"
+        "    try:\n"
+        "        return int(x)\n"
+        "    except ValueError as e:\n"
+        "        return type(e).__name__\n"
+    )
+    (src/"b.py").write_text(
+        "from .a import f\n\n\n"
+        "print(f('1'), f('z'))\n"
+    )
+
+    result = obfuscator(src, dst/"pkg", "-j", "2")
+    assert result.returncode == 0, result.stderr
+
+    result = import_all(dst)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "1 ValueError\n"
+
+
+SOURCES = {
+    "__init__.py": b"from .shapes import Circle, area as total_area\n",
+    "shapes.py": (
+        b"import math\n"
+        b"from . import util\n"
+        b"from .util import scale as _scale\n\n\n"
+        b"class Circle:\n"
+        b"    unit = 1\n\n"
+        b"    def __init__(self, radius, /, *, name='c'):\n"
+        b"        self.radius = radius\n"
+        b"        self.name = name\n\n"
+        b"    def area(self):\n"
+        b"        return math.pi * _scale(self.radius) ** 2\n\n"
+        b"    async def fetch(self, *args, **kwargs):\n"
+        b"        return [a for a in args if a] + list(kwargs)\n\n\n"
+        b"def area(shapes):\n"
+        b"    key = lambda s: s.area()\n"
+        b"    try:\n"
+        b"        return sum(key(s) for s in shapes)\n"
+        b"    except TypeError as error:\n"
+        b"        return {str(k): v for k, v in enumerate(error.args)}\n"
+    ),
+    "util.py": (
+        b"FACTOR = 2\n\n\n"
+        b"def scale(value, factor=FACTOR):\n"
+        b"    return value * factor\n"
+    ),
+}
+
+
+def obfuscated(sharded: bool) -> dict[str, bytes]:
+    root_package = load_sources("pkg", SOURCES)
+    if sharded:
+        link_sharded(root_package, jobs=2)
+        # Фикстура содержит все типы вершин, проходящие через ShardPickler
+        found = {type(n) for m in root_package.walk() for n in ast.walk(m)}
+        assert set(NODE_TYPES) <= found
+    else:
+        link(root_package)
+    obfuscate(root_package, generator=SequentialNameGenerator())
+    return emit_sources(root_package)
+
+
+def test_sharded_link_matches_serial():
+    """Связывание в нескольких процессах дает тот же результат,
+    что и связывание в текущем процессе"""
+    assert obfuscated(sharded=True) == obfuscated(sharded=False)
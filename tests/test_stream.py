@@ -0,0 +1,44 @@
+from pathlib import Path
+
+
+SOURCES = {
+    "__init__.py": "from .core import Engine\n",
+    "core.py": (
+        "from .util import scale\n\n\n"
+        "class Engine:\n"
+        "    def __init__(self, n):\n"
+        "        self.n = n\n\n"
+        "    def run(self):\n"
+        "        total = 0\n"
+        "        for i in range(self.n):\n"
+        "            total += scale(i)\n"
+        "        return [total, *(scale(j) for j in range(2))]\n"
+    ),
+    "util.py": (
+        "FACTOR = 3\n\n\n"
+        "def scale(value):\n"
+        "    def inner(v):\n"
+        "        return v * FACTOR\n"
+        "    return inner(value)\n"
+    ),
+    "main.py": "from . import Engine\n\nprint(Engine(4).run())\n",
+}
+
+
+def test_stream(tmp_path: Path, obfuscator, import_all):
+    """Модули, записанные в режиме --stream, выполняются так же,
+    как записанные обычной сборкой"""
+    src = tmp_path/"src"/"pkg"
+    for name, source in SOURCES.items():
+        (src/name).parent.mkdir(parents=True, exist_ok=True)
+        (src/name).write_text(source, encoding="utf-8")
+
+    for dst, args in (("default", ()), ("stream", ("--stream",))):
+        result = obfuscator(src, tmp_path/dst/"pkg", *args)
+        assert result.returncode == 0, result.stderr
+
+        result = import_all(tmp_path/dst)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout == "[18, 0, 3]\n"
+        for path in (tmp_path/dst).rglob("*.py"):
+            assert "scale" not in path.read_text(encoding="utf-8")
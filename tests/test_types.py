@@ -0,0 +1,70 @@
+from obfuscator.load import load_sources
+from obfuscator.link import link
+from obfuscator.types import ImportFrom
+
+
+def test_package_index():
+    """Поиск модулей и подпакетов по имени, в том числе после
+    переименования и перемещения"""
+    root_package = load_sources("pkg", {
+        "__init__.py": b"",
+        "a.py": b"",
+        "sub/__init__.py": b"",
+        "sub/b.py": b"",
+    })
+    a = root_package.get("a")
+    sub = root_package.get("sub")
+    assert root_package.try_get_module("a") is a
+    assert root_package.try_get_module("sub") is None
+    assert sub.try_get("b") is not None
+    assert root_package.try_get("b") is None
+    # Подпакеты добавляются при обходе файлов, раньше модулей
+    assert [e.name_ptr.data for e in root_package.entries] == [
+        "sub", "__init__", "a"
+    ]
+
+    # Индекс перестраивается по новым именам с сохранением порядка
+    a.name_ptr.data = "_x"
+    root_package.reindex()
+    assert root_package.try_get("a") is None
+    assert root_package.get("_x") is a
+    assert [e.name_ptr.data for e in root_package.entries] == [
+        "sub", "__init__", "_x"
+    ]
+
+    # Удаление по устаревшему индексу
+    sub.name_ptr.data = "_y"
+    root_package.remove_entry(sub)
+    assert list(root_package.entries) == [root_package.get("__init__"), a]
+
+    a.move_to(root_package.get_or_add_package("other"))
+    assert root_package.try_get("_x") is None
+    assert root_package.get("other").get("_x") is a
+
+
+def test_import_path():
+    """Уровень и модуль импорта следуют за переименованием пакетов
+    и перемещением модулей"""
+    root_package = load_sources("pkg", {
+        "__init__.py": b"",
+        "a.py": b"from .sub.b import X\n",
+        "sub/__init__.py": b"",
+        "sub/b.py": b"X = 1\n",
+    })
+    link(root_package)
+    a = root_package.get("a")
+    sub = root_package.get("sub")
+    node = a.body[0]
+    assert isinstance(node, ImportFrom)
+    assert (node.level, node.module) == (1, "sub.b")
+
+    # Ячейки имен разделяются путями, кортеж пути не пересчитывается
+    parts = a.parts()
+    sub.name_ptr.data = "_s"
+    assert a.parts() is parts
+    assert (node.level, node.module) == (1, "_s.b")
+
+    a.move_to(sub)
+    assert a.parts() is not parts
+    assert [s.data for s in a.parts()] == ["pkg", "_s", "a"]
+    assert (node.level, node.module) == (1, "b")
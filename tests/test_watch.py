@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import subprocess
+from pathlib import Path
+from obfuscator.watch import Watcher
+from obfuscator.names import SequentialNameGenerator
+
+
+def write(path: Path, source: str):
+    """Запись файла; время изменения сдвигается вперед, чтобы Watcher
+    заметил изменение независимо от разрешения часов"""
+    path.write_text(source, encoding="utf-8")
+    ns = time.time_ns() + 10**9
+    os.utime(path, ns=(ns, ns))
+
+
+def import_all(dst: Path, package: str) -> subprocess.CompletedProcess:
+    """Импорт всех модулей пакета в отдельном процессе"""
+    return subprocess.run(
+        [
+            sys.executable, "-c",
+            "import importlib, pkgutil\n"
+            f"p = importlib.import_module({package!r})\n"
+            f"for m in pkgutil.walk_packages(p.__path__, {package + '.'!r}):\n"
+            "    importlib.import_module(m.name)\n"
+        ],
+        cwd=dst, capture_output=True, text=True
+    )
+
+
+def test_reexport_chain(tmp_path: Path):
+    """Модуль, использующий сущность через реэкспорт в __init__,
+    остается согласованным после изменения модуля, от которого
+    зависит модуль с сущностью"""
+    src = tmp_path/"src"/"pkg"
+    dst = tmp_path/"dst"
+    src.mkdir(parents=True)
+    write(src/"_core.py", "X = 1\n")
+    write(
+        src/"_m.py",
+        "from ._core import X\n\n\n"
+        "class Engine:\n"
+        "    def run(self):\n"
+        "        return X\n"
+    )
+    write(src/"__init__.py", "from ._m import Engine\n")
+    write(
+        src/"app.py",
+        "from . import Engine\n\n\n"
+        "def main():\n"
+        "    return Engine().run()\n"
+    )
+
+    watcher = Watcher(src, dst/"pkg", SequentialNameGenerator())
+    watcher.build()
+    assert import_all(dst, "pkg").returncode == 0
+
+    write(src/"_core.py", "X = 2\n")
+    watcher.poll()
+    assert import_all(dst, "pkg").returncode == 0
+
+    write(
+        src/"app.py",
+        "from . import Engine\n\n\n"
+        "def main():\n"
+        "    return Engine().run() + 1\n"
+    )
+    watcher.poll()
+    result = import_all(dst, "pkg")
+    assert result.returncode == 0, result.stderr
+
+
+def test_reexported_module_edit(tmp_path: Path):
+    """Изменение реэкспортируемого модуля"""
+    src = tmp_path/"src"/"pkg"
+    dst = tmp_path/"dst"
+    src.mkdir(parents=True)
+    write(
+        src/"_m.py",
+        "class Engine:\n"
+        "    def run(self):\n"
+        "        return 1\n"
+    )
+    write(src/"__init__.py", "from ._m import Engine\n")
+    write(
+        src/"app.py",
+        "from . import Engine\n\n\n"
+        "def main():\n"
+        "    return Engine().run()\n"
+    )
+
+    watcher = Watcher(src, dst/"pkg", SequentialNameGenerator())
+    watcher.build()
+
+    write(
+        src/"_m.py",
+        "LIMIT = 2\n\n\n"
+        "class Engine:\n"
+        "    def run(self):\n"
+        "        return LIMIT\n"
+    )
+    watcher.poll()
+    result = import_all(dst, "pkg")
+    assert result.returncode == 0, result.stderr